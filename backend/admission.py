@@ -0,0 +1,286 @@
+"""Admission control for the model-backed endpoints.
+
+Three layers, cheapest first:
+
+- token buckets per client and one global bucket, checked before any work is
+  done; an empty bucket answers 429 with Retry-After. RATE_LIMIT_ENABLED=false
+  turns these off.
+- a cap on model-backed requests in flight per worker (ADMISSION_MAX_INFLIGHT,
+  0 for none); beyond it the request is refused with 503 and Retry-After
+  instead of queueing behind the others. It applies with or without rate limits.
+- a bounded semaphore around the model call itself (GeminiService.analyze_image).
+  A call that can't get a slot within GEMINI_QUEUE_TIMEOUT is skipped, and
+  the engine chain falls back to the local/static engines.
+
+Buckets and model slots live in the worker by default. RATE_LIMIT_STORE_PATH
+(a SQLite file) and GEMINI_SEMAPHORE_DIR (a directory of lock files) share
+them across the gunicorn workers of one host.
+"""
+import fcntl
+import functools
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import jsonify, request
+
+from backend.config import Config
+from backend.metrics import ADMISSION_REJECTIONS, registry
+
+
+class Overloaded(Exception):
+    """No model slot became free in time."""
+
+
+class MemoryBucketStore:
+    """Token buckets for this worker process only."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets, cost=1):
+        """Takes `cost` tokens from every (key, rate, burst) bucket, or from none.
+
+        Returns 0 on success, otherwise the seconds until all buckets could pay.
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = {}
+            for key, rate, burst in buckets:
+                tokens, updated = self._buckets.get(key, (burst, now))
+                levels[key] = min(burst, tokens + (now - updated) * rate)
+            wait = _wait_time(buckets, levels, cost)
+            if wait:
+                return wait
+            for key, _, _ in buckets:
+                self._buckets[key] = (levels[key] - cost, now)
+        return 0
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file shared by the workers of one host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " key TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, buckets, cost=1):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = {}
+            for key, rate, burst in buckets:
+                row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE key = ?",
+                                   (key,)).fetchone()
+                tokens, updated = row if row else (burst, now)
+                levels[key] = min(burst, tokens + max(0.0, now - updated) * rate)
+            wait = _wait_time(buckets, levels, cost)
+            if not wait:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    [(key, levels[key] - cost, now) for key, _, _ in buckets])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+def _wait_time(buckets, levels, cost):
+    wait = 0.0
+    for key, rate, burst in buckets:
+        if cost > burst:
+            return math.inf
+        if levels[key] < cost:
+            wait = max(wait, (cost - levels[key]) / rate if rate > 0 else math.inf)
+    return wait
+
+
+class RateLimiter:
+    def __init__(self, store, user_rate, user_burst, global_rate, global_burst):
+        self.store = store
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+
+    def check(self, user_key, cost=1):
+        """0 if admitted, else the number of seconds to wait."""
+        buckets = []
+        if self.user_rate > 0:
+            buckets.append((f'user:{user_key}', self.user_rate, self.user_burst))
+        if self.global_rate > 0:
+            buckets.append(('global', self.global_rate, self.global_burst))
+        if not buckets:
+            return 0
+        try:
+            return self.store.take(buckets, cost)
+        except sqlite3.Error:
+            # A broken shared store must not take the API down with it
+            return 0
+
+
+class ModelSlots:
+    """At most `slots` concurrent model calls in this worker."""
+
+    def __init__(self, slots, timeout):
+        self.slots = slots
+        self.timeout = timeout
+        self._semaphore = threading.BoundedSemaphore(slots)
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    def in_use(self):
+        return self._in_use
+
+    def _wait(self, timeout):
+        # The configured queue timeout, cut short by the caller's remaining deadline
+        return max(0.0, self.timeout if timeout is None else min(self.timeout, timeout))
+
+    def acquire(self, timeout=None):
+        """Returns a token for release(); raises Overloaded after `timeout` seconds.
+
+        `timeout` can only shorten the configured GEMINI_QUEUE_TIMEOUT.
+        """
+        if not self._semaphore.acquire(timeout=self._wait(timeout)):
+            raise Overloaded(f"All {self.slots} model slots busy")
+        with self._lock:
+            self._in_use += 1
+        return None
+
+    def release(self, token):
+        with self._lock:
+            self._in_use -= 1
+        self._semaphore.release()
+
+
+class FileModelSlots(ModelSlots):
+    """Model slots shared across processes: one flock()ed file per slot."""
+
+    poll_interval = 0.02
+
+    def __init__(self, directory, slots, timeout):
+        super().__init__(slots, timeout)
+        os.makedirs(directory, exist_ok=True)
+        self.paths = [os.path.join(directory, f'model-slot-{i}.lock') for i in range(slots)]
+
+    def acquire(self, timeout=None):
+        deadline = time.monotonic() + self._wait(timeout)
+        while True:
+            for path in self.paths:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    continue
+                with self._lock:
+                    self._in_use += 1
+                return fd
+            if time.monotonic() >= deadline:
+                raise Overloaded(f"All {self.slots} shared model slots busy")
+            time.sleep(self.poll_interval)
+
+    def release(self, fd):
+        with self._lock:
+            self._in_use -= 1
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+class InflightLimiter:
+    def __init__(self, limit):
+        self.limit = limit
+        self.current = 0
+        self._lock = threading.Lock()
+
+    def try_enter(self):
+        with self._lock:
+            if self.limit and self.current >= self.limit:
+                return False
+            self.current += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.current -= 1
+
+
+def _build_rate_limiter():
+    store = SQLiteBucketStore(Config.RATE_LIMIT_STORE_PATH) if Config.RATE_LIMIT_STORE_PATH else MemoryBucketStore()
+    return RateLimiter(store, Config.RATE_LIMIT_USER_RATE, Config.RATE_LIMIT_USER_BURST,
+                       Config.RATE_LIMIT_GLOBAL_RATE, Config.RATE_LIMIT_GLOBAL_BURST)
+
+
+def _build_model_slots():
+    if Config.GEMINI_SEMAPHORE_DIR:
+        return FileModelSlots(Config.GEMINI_SEMAPHORE_DIR, Config.GEMINI_MAX_CONCURRENCY, Config.GEMINI_QUEUE_TIMEOUT)
+    return ModelSlots(Config.GEMINI_MAX_CONCURRENCY, Config.GEMINI_QUEUE_TIMEOUT)
+
+
+rate_limiter = _build_rate_limiter()
+model_slots = _build_model_slots()
+inflight = InflightLimiter(Config.ADMISSION_MAX_INFLIGHT)
+
+registry.callback('aura_model_slots_in_use', 'Model calls holding a concurrency slot.', (),
+                  lambda: {(): model_slots.in_use()})
+registry.callback('aura_admission_inflight', 'Model-backed requests in flight.', (),
+                  lambda: {(): inflight.current})
+
+
+def _refuse(status, message, retry_after):
+    response = jsonify({"error": message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(min(retry_after, 3600))))
+    return response
+
+
+def _client_key():
+    # Requests carry no verified identity (the form's username is whatever the
+    # client sends, so rotating it would mint fresh buckets); key on the client
+    # address, which ProxyFix (PROXY_FIX_X_FOR) takes from the router's X-Forwarded-For
+    return request.remote_addr or 'anonymous'
+
+
+def admission_controlled(cost=1):
+    """Route decorator: rate-limits by client and globally, and caps requests in flight.
+
+    `cost` is the number of tokens the request takes, or a callable that works
+    it out from the request (e.g. how many analyses it asks for).
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if Config.RATE_LIMIT_ENABLED:
+                wait = rate_limiter.check(_client_key(), cost() if callable(cost) else cost)
+                if wait:
+                    ADMISSION_REJECTIONS.inc(reason='rate_limited')
+                    return _refuse(429, "Too many analysis requests, please slow down", wait)
+            if not inflight.try_enter():
+                ADMISSION_REJECTIONS.inc(reason='overloaded')
+                return _refuse(503, "Analysis service is busy, please retry shortly", Config.ADMISSION_RETRY_AFTER)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                inflight.leave()
+        return wrapper
+    return decorator
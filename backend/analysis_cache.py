@@ -0,0 +1,235 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(image, analysis_type, prompt=''):
+    """Content address for an analysis: image hash + analysis type + prompt hash.
+
+    `image` is raw image bytes or an already computed sha256 hex digest.
+    """
+    image_hash = image if isinstance(image, str) else hashlib.sha256(image).hexdigest()
+    prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+    return f"{analysis_type}:{prompt_hash}:{image_hash}"
+
+
+class MemoryTier:
+    """In-process LRU tier. Values are deep-copied so callers can't mutate cached results."""
+    name = 'memory'
+
+    def __init__(self, max_entries=256, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time(), copy.deepcopy(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteTier:
+    """On-disk tier shared by every worker on a node, with TTL and size-based eviction."""
+    name = 'disk'
+
+    def __init__(self, path, ttl=None, max_entries=10000, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_analysis_cache_accessed_at"
+                " ON analysis_cache (accessed_at)"
+            )
+
+    def _connect(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, created_at FROM analysis_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        now = time.time()
+        if self.ttl and now - created_at > self.ttl:
+            conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE analysis_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key, value):
+        payload = json.dumps(value)
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO analysis_cache (key, value, size, created_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, payload, len(payload), now, now),
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        if self.ttl:
+            conn.execute("DELETE FROM analysis_cache WHERE created_at < ?", (now - self.ttl,))
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis_cache"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Drop least recently used rows until both limits hold again
+        rows = conn.execute(
+            "SELECT key, size FROM analysis_cache ORDER BY accessed_at ASC"
+        ).fetchall()
+        doomed = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM analysis_cache WHERE key = ?", doomed)
+
+    def clear(self):
+        self._connect().execute("DELETE FROM analysis_cache")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+
+
+class AnalysisCache:
+    """Tiered read-through cache for analysis results.
+
+    Lookups walk the tiers in order; a hit in a slower tier is promoted into the
+    faster ones. Hit/miss counters are kept per tier and overall.
+    """
+
+    def __init__(self, tiers=None):
+        self.tiers = list(tiers or [])
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0}
+        self._tier_hits = {tier.name: 0 for tier in self.tiers}
+
+    def add_tier(self, tier):
+        self.tiers.append(tier)
+        self._tier_hits.setdefault(tier.name, 0)
+
+    def get(self, key):
+        for index, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                logger.warning("Cache tier %s read failed: %s", tier.name, e)
+                continue
+            if value is not None:
+                for faster in self.tiers[:index]:
+                    faster.set(key, value)
+                with self._lock:
+                    self._stats['hits'] += 1
+                    self._tier_hits[tier.name] += 1
+                return value
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def set(self, key, value):
+        if value is None:
+            return
+        for tier in self.tiers:
+            try:
+                tier.set(key, value)
+            except Exception as e:
+                logger.warning("Cache tier %s write failed: %s", tier.name, e)
+        with self._lock:
+            self._stats['sets'] += 1
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['tier_hits'] = dict(self._tier_hits)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['entries'] = {}
+        for tier in self.tiers:
+            try:
+                stats['entries'][tier.name] = len(tier)
+            except Exception:
+                stats['entries'][tier.name] = None
+        return stats
+
+
+def build_cache(config=Config):
+    if not config.ANALYSIS_CACHE_ENABLED:
+        return AnalysisCache()
+    cache = AnalysisCache([
+        MemoryTier(config.ANALYSIS_CACHE_MEMORY_ENTRIES, config.ANALYSIS_CACHE_TTL),
+    ])
+    if config.ANALYSIS_CACHE_PATH:
+        try:
+            cache.add_tier(SQLiteTier(
+                config.ANALYSIS_CACHE_PATH,
+                ttl=config.ANALYSIS_CACHE_TTL,
+                max_entries=config.ANALYSIS_CACHE_DISK_ENTRIES,
+                max_bytes=config.ANALYSIS_CACHE_DISK_BYTES,
+            ))
+        except Exception as e:
+            logger.warning("Disk analysis cache disabled: %s", e)
+    return cache
+
+
+analysis_cache = build_cache()
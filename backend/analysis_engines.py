@@ -0,0 +1,195 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from backend.config import Config
+from backend.gemini_service import GeminiService
+from backend.image_preprocessing import PreparedImage, prepare_image
+from backend.metrics import ENGINE_SECONDS, LOCAL_ANALYSIS_SECONDS
+from backend.single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+
+def _local_skin_tone(image):
+    from backend.skin_analysis import analyze_skin_tone
+    # Reuse the request's decoded, downscaled image instead of decoding again
+    with LOCAL_ANALYSIS_SECONDS.time(mode='fast' if Config.LOCAL_ENGINE_FAST else 'full'):
+        return analyze_skin_tone(image.as_bgr_array(), fast=Config.LOCAL_ENGINE_FAST)
+
+
+# Engines available per analysis type. Static engines never fail and are only
+# used once every real engine has failed or missed its deadline.
+ENGINES = {
+    'skin_tone': {
+        'gemini': GeminiService.analyze_skin_tone,
+        'local': _local_skin_tone,
+        'static': GeminiService.get_dummy_skin_tone,
+    },
+    'body_shape': {
+        'gemini': GeminiService.analyze_body_shape,
+        'static': GeminiService.get_dummy_body_shape,
+    },
+    'skin_health': {
+        'gemini': GeminiService.analyze_skin_health,
+        'static': GeminiService.get_dummy_skin_health,
+    },
+}
+
+# One pool per engine: a model call that missed its deadline keeps its thread
+# until it returns, and must not leave the local engine queued behind it
+_executors = {}
+_executors_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(engine):
+    global _executors_pid
+    with _executor_lock:
+        if _executors_pid != os.getpid():
+            _executors.clear()
+            _executors_pid = os.getpid()
+        executor = _executors.get(engine)
+        if executor is None:
+            executor = _executors[engine] = ThreadPoolExecutor(
+                max_workers=Config.ANALYSIS_ENGINE_POOL_SIZE, thread_name_prefix=f'analysis-{engine}')
+        return executor
+
+
+def _timed(analysis_type, name, engine, image):
+    # Runs on the pool thread, so the timing covers engines that miss their deadline too
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        result = engine(image)
+        outcome = 'ok' if result else 'empty'
+        return result
+    finally:
+        ENGINE_SECONDS.observe(time.perf_counter() - started, analysis=analysis_type,
+                               engine=name, outcome=outcome)
+
+
+def parse_deadlines(spec):
+    """'gemini=8,local=2' -> {'gemini': 8.0, 'local': 2.0}"""
+    deadlines = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            name, seconds = item.split('=', 1)
+            deadlines[name.strip()] = float(seconds)
+    return deadlines
+
+
+def get_chain(analysis_type):
+    available = ENGINES[analysis_type]
+    configured = Config.ANALYSIS_ENGINE_CHAIN.get(analysis_type) or Config.ANALYSIS_ENGINE_CHAIN['default']
+    chain = [name.strip() for name in configured.split(',') if name.strip() in available] or list(available)
+    if 'static' not in chain:
+        # The routes promise an answer, so the dummy result always backs the real engines
+        chain.append('static')
+    return chain
+
+
+def _finish(result, engine):
+    result = dict(result)
+    result['engine'] = engine
+    return result
+
+
+def run_engine_chain(analysis_type, image, chain=None, race=None):
+    """Runs the configured engines for `analysis_type` and returns the first good result.
+
+    Sequential mode tries engines in order, each bounded by its deadline.
+    Race mode starts every real engine at once and takes the first good answer.
+    When no real engine answers, the static dummy data is returned, so the
+    result is never None. It carries an 'engine' key naming its engine.
+    `image` is a PreparedImage (raw bytes are prepared here).
+
+    Concurrent calls for the same image and analysis type are coalesced into
+    one run (see backend.single_flight).
+    """
+    if not isinstance(image, PreparedImage):
+        image = prepare_image(image)
+    chain = chain or get_chain(analysis_type)
+    race = Config.ANALYSIS_ENGINE_RACE if race is None else race
+    if not Config.ANALYSIS_SINGLE_FLIGHT:
+        return _run_chain(analysis_type, image, chain, race)
+    key = f"{analysis_type}:{image.digest}:{','.join(chain)}:{int(race)}"
+    return single_flight.do(key, lambda: _run_chain(analysis_type, image, chain, race))
+
+
+def _run_chain(analysis_type, image, chain, race):
+    deadlines = parse_deadlines(Config.ANALYSIS_ENGINE_DEADLINES)
+    engines = ENGINES[analysis_type]
+    real = [name for name in chain if name != 'static']
+
+    if race and len(real) > 1:
+        result = _race(analysis_type, image, real, engines, deadlines)
+        if result:
+            return result
+    else:
+        for name in real:
+            future = _get_executor(name).submit(_timed, analysis_type, name, engines[name], image)
+            try:
+                result = future.result(timeout=deadlines.get(name, Config.ANALYSIS_ENGINE_DEFAULT_DEADLINE))
+            except FutureTimeout:
+                logger.warning("%s %s engine missed its deadline", name, analysis_type)
+                continue
+            except Exception as e:
+                logger.warning("%s %s engine error: %s", name, analysis_type, e)
+                continue
+            if result:
+                return _finish(result, name)
+            logger.info("%s %s engine returned no result", name, analysis_type)
+
+    logger.warning("Using dummy %s analysis", analysis_type)
+    return _finish(engines['static'](), 'static')
+
+
+def _race(analysis_type, image, names, engines, deadlines):
+    futures = {_get_executor(name).submit(_timed, analysis_type, name, engines[name], image): name
+               for name in names}
+    timeout = max(deadlines.get(name, Config.ANALYSIS_ENGINE_DEFAULT_DEADLINE) for name in names)
+    pending = set(futures)
+    remaining = timeout
+    while pending and remaining > 0:
+        started = time.monotonic()
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        remaining -= time.monotonic() - started
+        for future in done:
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning("%s %s engine error: %s", name, analysis_type, e)
+                continue
+            if result:
+                for other in pending:
+                    other.cancel()
+                return _finish(result, name)
+    logger.warning("No %s engine answered within %ss", analysis_type, timeout)
+    return None
+
+
+def run_merged(image, analysis_types):
+    """Asks Gemini for several analyses in one call, bounded by the gemini deadline.
+
+    Returns {type: result} with only the parts the model actually answered;
+    callers fall back to the per-type chains for the rest.
+    """
+    if not isinstance(image, PreparedImage):
+        image = prepare_image(image)
+    deadline = parse_deadlines(Config.ANALYSIS_ENGINE_DEADLINES).get('gemini', Config.ANALYSIS_ENGINE_DEFAULT_DEADLINE)
+    future = _get_executor('gemini').submit(_timed, 'merged', 'gemini',
+                                    lambda img: GeminiService.analyze_merged(img, analysis_types), image)
+    try:
+        parts = future.result(timeout=deadline)
+    except FutureTimeout:
+        logger.warning("Merged analysis missed its deadline")
+        return {}
+    except Exception as e:
+        logger.warning("Merged analysis error: %s", e)
+        return {}
+    return {t: _finish(part, 'gemini-merged') for t, part in parts.items() if isinstance(part, dict) and part}
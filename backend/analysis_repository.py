@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from backend.config import Config
+from backend.models import db, Analysis
+
+# Results from these engines are fallbacks (dummy data, or the OpenCV answer while
+# Gemini was down), not worth pinning to an image for ANALYSIS_HISTORY_CACHE_MAX_AGE
+_UNCACHEABLE_ENGINES = ('static', 'local')
+
+
+def _row(user_id, analysis_type, image_hash, result):
+    result = dict(result)
+    return {
+        'user_id': user_id,
+        'analysis_type': analysis_type,
+        'image_hash': image_hash,
+        'engine': result.get('engine'),
+        'latency_ms': result.pop('latency_ms', None),
+        'result': result,
+        'created_at': datetime.utcnow(),
+    }
+
+
+def record_analysis(user_id, analysis_type, image_hash, result):
+    """Adds one history row to the current session; the caller commits."""
+    entry = Analysis(**_row(user_id, analysis_type, image_hash, result))
+    db.session.add(entry)
+    return entry
+
+
+def record_analyses(user_id, image_hash, results):
+    """Bulk-inserts {analysis_type: result} as one executemany in the current transaction."""
+    rows = [_row(user_id, analysis_type, image_hash, result) for analysis_type, result in results.items()]
+    if rows:
+        db.session.execute(insert(Analysis), rows)
+    return len(rows)
+
+
+def latest_analysis(user_id, analysis_type):
+    return (Analysis.query
+            .filter_by(user_id=user_id, analysis_type=analysis_type)
+            .order_by(Analysis.created_at.desc(), Analysis.id.desc())
+            .first())
+
+
+def analysis_history(user_id, analysis_type=None, limit=20):
+    query = Analysis.query.filter_by(user_id=user_id)
+    if analysis_type:
+        query = query.filter_by(analysis_type=analysis_type)
+    return query.order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(limit).all()
+
+
+def find_cached_results(image_hash, analysis_types, max_age=None):
+    """Most recent reusable result per type for this image: {analysis_type: result}.
+
+    One indexed query covers every requested type.
+    """
+    max_age = Config.ANALYSIS_HISTORY_CACHE_MAX_AGE if max_age is None else max_age
+    rows = (db.session.query(Analysis.analysis_type, Analysis.result)
+            .filter(Analysis.image_hash == image_hash,
+                    Analysis.analysis_type.in_(list(analysis_types)),
+                    Analysis.created_at >= datetime.utcnow() - timedelta(seconds=max_age),
+                    ~Analysis.engine.in_(_UNCACHEABLE_ENGINES))
+            .order_by(Analysis.created_at.desc(), Analysis.id.desc())
+            .all())
+    found = {}
+    for analysis_type, result in rows:
+        found.setdefault(analysis_type, result)
+    return found
@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import has_app_context
+
+from backend.analysis_engines import run_engine_chain, run_merged
+from backend.analysis_repository import find_cached_results, record_analysis
+from backend.config import Config
+from backend.user_repository import update_user
+
+logger = logging.getLogger(__name__)
+
+# Each analysis is a (run, fields) pair: `run` turns a PreparedImage into a result dict
+# via the configured engine chain (never None: the chain ends in 'static'),
+# `fields` maps a result to the User columns it sets. Results carry 'engine' and 'latency_ms'.
+
+
+def _history_cache_enabled():
+    # The history table is only reachable inside an app context (routes, jobs)
+    return Config.ANALYSIS_HISTORY_CACHE and has_app_context()
+
+
+def _run(analysis_type, image):
+    started = time.perf_counter()
+    result = None
+    if _history_cache_enabled():
+        result = find_cached_results(image.digest, [analysis_type]).get(analysis_type)
+    if result is None:
+        result = run_engine_chain(analysis_type, image)
+    if result is not None:
+        result = dict(result, latency_ms=int((time.perf_counter() - started) * 1000))
+    return result
+
+
+def persist_analysis(user, analysis_type, image, result):
+    """Updates the profile columns `result` changes and appends it to the history; caller commits."""
+    if user is not None:
+        update_user(user, **ANALYSES[analysis_type][1](result))
+    record_analysis(user.id if user is not None else None, analysis_type, image.digest, result)
+
+
+def run_skin_tone(image):
+    return _run('skin_tone', image)
+
+
+def skin_tone_fields(result):
+    palette = result.get('recommended_colors', [])
+    return {
+        'skin_tone': result.get('skin_tone'),
+        'color_palette': ",".join(palette) if isinstance(palette, list) else str(palette),
+        'style_vibe': result.get('season'),
+    }
+
+
+def run_body_shape(image):
+    return _run('body_shape', image)
+
+
+def body_shape_fields(result):
+    return {'body_shape': result.get('body_shape')}
+
+
+def run_skin_health(image):
+    return _run('skin_health', image)
+
+
+def skin_health_fields(result):
+    return {'skin_type': result.get('skin_type')}
+
+
+ANALYSES = {
+    'skin_tone': (run_skin_tone, skin_tone_fields),
+    'body_shape': (run_body_shape, body_shape_fields),
+    'skin_health': (run_skin_health, skin_health_fields),
+}
+
+
+# Fields a result must carry (with their types) before it is written to the User row
+REQUIRED_FIELDS = {
+    'skin_tone': (('skin_tone', str), ('season', str), ('recommended_colors', (list, str))),
+    'body_shape': (('body_shape', str),),
+    'skin_health': (('skin_type', str),),
+}
+
+
+def validate_result(analysis_type, result):
+    if not isinstance(result, dict):
+        return False
+    return all(isinstance(result.get(field), kind) and result.get(field)
+               for field, kind in REQUIRED_FIELDS[analysis_type])
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    # Separate from the engine pool: each chain blocks on its own engine futures
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=Config.ANALYSIS_COMBINED_POOL_SIZE,
+                                       thread_name_prefix='analysis-combined')
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def run_analyses(image, analysis_types, merged=None):
+    """Runs several analyses on one PreparedImage; returns ({type: result}, {type: error}).
+
+    Concurrent mode runs each type's engine chain in parallel, so the wall time
+    is that of the slowest one. Merged mode first asks Gemini for all of them in
+    a single prompt and only runs the chains for parts that came back missing or
+    invalid. Results already in the analysis history for this image are reused
+    without running anything. Results that fail validation are reported as errors.
+    """
+    merged = Config.ANALYSIS_COMBINED_MODE == 'merged' if merged is None else merged
+    results, errors = {}, {}
+    if _history_cache_enabled():
+        # One lookup for every type here; the pool threads have no app context
+        for analysis_type, result in find_cached_results(image.digest, analysis_types).items():
+            if validate_result(analysis_type, result):
+                results[analysis_type] = dict(result, latency_ms=0)
+    pending = [t for t in analysis_types if t not in results]
+    if merged and len(pending) > 1:
+        started = time.perf_counter()
+        for analysis_type, result in run_merged(image, pending).items():
+            if validate_result(analysis_type, result):
+                results[analysis_type] = dict(result, latency_ms=int((time.perf_counter() - started) * 1000))
+            else:
+                logger.info("Merged %s result failed validation", analysis_type)
+
+    remaining = [t for t in analysis_types if t not in results]
+    futures = {t: _get_pool().submit(ANALYSES[t][0], image) for t in remaining}
+    for analysis_type, future in futures.items():
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.warning("%s analysis failed: %s", analysis_type, e)
+            errors[analysis_type] = "Analysis failed"
+            continue
+        if validate_result(analysis_type, result):
+            results[analysis_type] = result
+        else:
+            errors[analysis_type] = "Analysis returned an invalid result"
+    return results, errors
@@ -1,28 +1,62 @@
+import logging
+import os
 from flask import Flask, request
-from flask_migrate import Migrate
 from flask_cors import CORS
 from backend.config import Config
 from backend.models import db
 from backend.routes import main
+from backend.gemini_service import GeminiService
+from backend.recommendations import catalogue
+from backend.uploads import SpooledUploadRequest, reject_oversized_request
+from backend import db_pool, metrics, serialization, startup
+from backend.logging_setup import configure_logging
+
+logger = logging.getLogger(__name__)
 
 def create_app():
+    configure_logging()
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.request_class = SpooledUploadRequest
+    if app.config['PROXY_FIX_X_FOR']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    serialization.init_app(app)
     
     # Initialize extensions
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_pool.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
     db.init_app(app)
-    Migrate(app, db)
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        # Only the `flask db` commands need Flask-Migrate, and Alembic costs ~0.5s to import
+        from flask_migrate import Migrate
+        Migrate(app, db)
     CORS(app) # Enable CORS for generic access
     
     # Register blueprints
     app.register_blueprint(main)
+    metrics.init_app(app, db)
+    with app.app_context():
+        db_pool.instrument(db.engine)
+    
+    if app.config['GUNICORN_PRELOAD']:
+        # Import the analysis stack once for all workers; model clients are built after fork
+        startup.preload_analysis()
+    elif app.config['GEMINI_WARMUP']:
+        GeminiService.warm_up()
+    # Parse the recommendation catalogue now rather than on the first request
+    catalogue.get()
     
+    app.before_request(reject_oversized_request)
+
     @app.before_request
     def log_request_info():
-        app.logger.debug('URL: %s', request.url)
-        app.logger.debug('Method: %s', request.method)
-        app.logger.debug('Body: %s', request.get_data())
-        print(f">>> Request: {request.method} {request.path} | Remote: {request.remote_addr}")
+        # Never touch the body here: request.get_data() would buffer whole uploads
+        logger.info("request", extra={
+            'method': request.method,
+            'path': request.path,
+            'remote': request.remote_addr,
+            'content_length': request.content_length,
+        })
     
     return app
 
@@ -0,0 +1,194 @@
+"""Batch skin-tone analysis over a directory or manifest of images.
+
+Usage:
+    python -m backend.batch_analysis IMAGES_DIR_OR_MANIFEST -o results.jsonl [--fast]
+
+Results are appended one record per image as they complete, so an interrupted
+run can be resumed by re-running the same command; images recorded as errors
+(e.g. a corrupt file) are retried.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff'}
+CSV_FIELDS = ['path', 'status', 'skin_tone', 'season', 'recommended_colors', 'error', 'elapsed_ms']
+
+
+def iter_images(source):
+    """Yields image paths from a directory tree, or from a manifest with one path per line."""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield os.path.join(root, name)
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as manifest:
+        for line in manifest:
+            path = line.strip()
+            if not path or path.startswith('#'):
+                continue
+            yield path if os.path.isabs(path) else os.path.join(base, path)
+
+
+def _init_worker():
+    # One process per core already; keep OpenMP/BLAS and OpenCV single-threaded
+    # inside each worker so the pool doesn't oversubscribe the CPUs.
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def _analyze_path(path, fast):
+    from backend.skin_analysis import analyze_skin_tone, decode_image
+
+    started = time.perf_counter()
+    record = {'path': path, 'status': 'ok', 'error': None}
+    try:
+        # Decoding happens here, in the worker, so the parent never holds image data.
+        # It is done up front so a corrupt or unreadable file is an error, not an image without skin.
+        img = decode_image(path, fast=fast)
+        if img is None:
+            raise ValueError("Could not decode image (missing, unreadable or corrupt)")
+        result = analyze_skin_tone(img, fast=fast)
+        if result is None:
+            record['status'] = 'no_skin_detected'
+        else:
+            record.update(result)
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = str(e)
+    record['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return record
+
+
+class ResultWriter:
+    """Appends records as JSON lines or CSV rows, flushing after each one."""
+
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='')
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            if new_file:
+                self._csv.writeheader()
+
+    def write(self, record):
+        if self.fmt == 'csv':
+            row = dict(record)
+            if isinstance(row.get('recommended_colors'), list):
+                row['recommended_colors'] = ",".join(row['recommended_colors'])
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def load_completed(path, fmt):
+    """Paths already recorded in a previous run's output.
+
+    Errors don't count as done, so a resumed run retries them.
+    """
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, newline='') as f:
+        if fmt == 'csv':
+            for row in csv.DictReader(f):
+                if row['status'] != 'error':
+                    done.add(row['path'])
+        else:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if record['status'] != 'error':
+                        done.add(record['path'])
+                except (ValueError, KeyError):
+                    # A truncated last line from an interrupted run; redo that image
+                    continue
+    return done
+
+
+def analyze_batch(source, output, fmt=None, workers=None, fast=False, resume=True,
+                  max_in_flight=None, progress=None):
+    """Analyzes every image under `source` and appends results to `output`.
+
+    At most `max_in_flight` images (default twice the worker count) are being
+    processed at any time, which bounds memory regardless of archive size.
+    Returns a summary dict with counts per status.
+    """
+    fmt = fmt or ('csv' if output.endswith('.csv') else 'jsonl')
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    done = load_completed(output, fmt) if resume else set()
+    if not resume and os.path.exists(output):
+        os.remove(output)
+
+    summary = {'ok': 0, 'no_skin_detected': 0, 'error': 0, 'skipped': 0}
+    started = time.perf_counter()
+    writer = ResultWriter(output, fmt)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            in_flight = set()
+            for path in iter_images(source):
+                if path in done:
+                    summary['skipped'] += 1
+                    continue
+                if len(in_flight) >= max_in_flight:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    _drain(finished, writer, summary, progress)
+                in_flight.add(pool.submit(_analyze_path, path, fast))
+            finished, _ = wait(in_flight)
+            _drain(finished, writer, summary, progress)
+    finally:
+        writer.close()
+
+    summary['elapsed_s'] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def _drain(futures, writer, summary, progress):
+    for future in futures:
+        record = future.result()
+        writer.write(record)
+        summary[record['status']] += 1
+        if progress:
+            progress(record)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch skin-tone analysis over an image archive.")
+    parser.add_argument('source', help="Directory of images, or a manifest file with one path per line")
+    parser.add_argument('-o', '--output', required=True, help="Results file (.jsonl or .csv)")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help="Defaults to the output file extension")
+    parser.add_argument('-w', '--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--fast', action='store_true', help="Use the reduced-resolution fast path")
+    parser.add_argument('--no-resume', action='store_true', help="Overwrite output instead of resuming")
+    args = parser.parse_args(argv)
+
+    def report(record):
+        print(f"{record['status']:>16}  {record['elapsed_ms']:>8.1f} ms  {record['path']}")
+
+    summary = analyze_batch(args.source, args.output, fmt=args.format, workers=args.workers,
+                            fast=args.fast, resume=not args.no_resume, progress=report)
+    print(json.dumps(summary))
+    return 0 if summary['error'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,530 @@
+"""Reproducible benchmarks for the API endpoints and the local analysis engine.
+
+Drives the app from create_app() against a throwaway SQLite database, with
+Gemini replaced by the fake model provider (configurable latency, error and
+malformed-output rates), either in-process (Flask
+test client) or over a local HTTP server. Also micro-benchmarks
+analyze_skin_tone and get_ita_category on synthetic images, colour ranking
+against the shipped palette catalogue and a large synthetic one, JSON
+encoding per serializer backend and JSON extraction from model replies, and
+worker cold start (import time and RSS, optionally per-worker memory under
+gunicorn with and without preload). The skin tone fast path is checked
+against the full one with compare_fast_path().
+
+    python -m backend.benchmark --save-baseline bench_baseline.json
+    python -m backend.benchmark --baseline bench_baseline.json   # exit 1 on regression
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+SCENARIOS = ('login', 'profile', 'signup', 'skin_tone', 'body_shape', 'skin_health')
+IMAGE_SIZES = ((640, 480), (1600, 1200), (4000, 3000))
+COLOUR_CATALOGUE_SIZE = 5000
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed, errors=0):
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def synthetic_image(width, height, fmt='JPEG', seed=0):
+    """A face-like skin ellipse with smooth shading on a flat background."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    img = np.empty((height, width, 3), np.float32)
+    img[:] = rng.integers(0, 255, 3)
+    skin = np.array([rng.integers(120, 240), 0, 0], np.float32)
+    skin[1] = skin[0] * rng.uniform(0.65, 0.85)
+    skin[2] = skin[1] * rng.uniform(0.7, 0.9)
+    mask = ((yy - height / 2) / (height / 3)) ** 2 + ((xx - width / 2) / (width / 4)) ** 2 < 1
+    shade = (np.sin(xx / width * 6) * np.cos(yy / height * 4) * 20)[..., None]
+    img[mask] = (skin + shade)[mask]
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(img, 0, 255).astype(np.uint8)).save(buffer, fmt, quality=90)
+    return buffer.getvalue()
+
+
+def install_fake_model(latency, error_rate=0.0, malformed_rate=0.0, over_http=False):
+    """Routes model calls to the fake provider, in-process or via a local fake server."""
+    from backend.fake_model_server import serve_in_thread
+    from backend.model_providers import FakeProvider, HttpProvider, set_provider
+
+    fake = FakeProvider(latency, error_rate, malformed_rate, seed=0)
+    if over_http:
+        _, url = serve_in_thread(fake)
+        set_provider(HttpProvider(url))
+    else:
+        set_provider(fake)
+    return fake
+
+
+def _multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data) in files.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                   f'Content-Type: image/jpeg\r\n\r\n'.encode())
+        body.write(data)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, fields=None, files=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        data = dict(fields or {})
+        for name, (filename, payload) in (files or {}).items():
+            data[name] = (io.BytesIO(payload), filename, 'image/jpeg')
+        if method == 'GET':
+            return client.get(path, query_string=data).status_code
+        return client.post(path, data=data).status_code
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def request(self, method, path, fields=None, files=None):
+        url = self.base_url + path
+        if method == 'GET':
+            if fields:
+                url += '?' + urllib.parse.urlencode(fields)
+            req = urllib.request.Request(url)
+        else:
+            body, content_type = _multipart(fields or {}, files or {})
+            req = urllib.request.Request(url, data=body, headers={'Content-Type': content_type})
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def build_requests(scenario, images):
+    portrait = images['portrait']
+    face = images['face']
+    if scenario == 'login':
+        return lambda i: ('POST', '/login', {'username': 'bench', 'password': 'bench'}, None)
+    if scenario == 'profile':
+        return lambda i: ('GET', '/profile', {'username': 'bench'}, None)
+    if scenario == 'signup':
+        run = uuid.uuid4().hex[:8]
+        return lambda i: ('POST', '/signup', {'username': f'b{run}{i}', 'email': f'b{run}{i}@bench.local',
+                                              'password': 'x'}, None)
+    if scenario == 'skin_tone':
+        return lambda i: ('POST', '/api/skin-tone-detection', {'username': 'bench'},
+                          {'profile_pic': ('face.jpg', face)})
+    if scenario == 'body_shape':
+        return lambda i: ('POST', '/api/body-shape-analysis', {'username': 'bench'},
+                          {'image': ('body.jpg', portrait)})
+    if scenario == 'skin_health':
+        return lambda i: ('POST', '/api/skin-analysis', {'username': 'bench'}, {'image': ('face.jpg', face)})
+    raise ValueError(scenario)
+
+
+def run_scenario(client, make_request, count, concurrency):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        method, path, fields, files = make_request(i)
+        started = time.perf_counter()
+        status = client.request(method, path, fields, files)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(count)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def run_endpoint_benchmarks(app, modes, scenarios, count, concurrency):
+    images = {'face': synthetic_image(800, 800, seed=1), 'portrait': synthetic_image(600, 1000, seed=2)}
+    results = {}
+    for mode in modes:
+        server = None
+        if mode == 'server':
+            from werkzeug.serving import make_server
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            client = HttpClient(f'http://127.0.0.1:{server.server_port}')
+        else:
+            client = InProcessClient(app)
+        try:
+            for scenario in scenarios:
+                make_request = build_requests(scenario, images)
+                # Warm-up with request indexes past the measured range (signup needs unique users)
+                run_scenario(client, lambda i: make_request(count + i), min(5, count), 1)
+                results[f'{mode}.{scenario}'] = run_scenario(client, make_request, count, concurrency)
+        finally:
+            if server:
+                server.shutdown()
+    return results
+
+
+def run_micro_benchmarks(repeat):
+    import numpy as np
+    from backend.skin_analysis import analyze_skin_tone, get_ita_category
+
+    results = {}
+    for width, height in IMAGE_SIZES:
+        image = synthetic_image(width, height, seed=width)
+        for fast in (False, True):
+            latencies = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                analyze_skin_tone(image, fast=fast)
+                latencies.append(time.perf_counter() - started)
+            name = f"micro.analyze_skin_tone.{'fast' if fast else 'full'}.{width}x{height}"
+            results[name] = summarize(latencies, sum(latencies))
+
+    # What the routes' local engine gets: the upload already decoded and downscaled
+    from backend.image_preprocessing import prepare_image
+    array = prepare_image(synthetic_image(*IMAGE_SIZES[-1], seed=0)).as_bgr_array()
+    latencies = []
+    for _ in range(repeat * 10):
+        started = time.perf_counter()
+        analyze_skin_tone(array, fast=True)
+        latencies.append(time.perf_counter() - started)
+    height, width = array.shape[:2]
+    results[f'micro.analyze_skin_tone.fast.array{width}x{height}'] = summarize(latencies, sum(latencies))
+
+    colours = np.random.default_rng(0).integers(0, 256, (2000, 3))
+    latencies = []
+    for rgb in colours:
+        started = time.perf_counter()
+        get_ita_category(rgb)
+        latencies.append(time.perf_counter() - started)
+    results['micro.get_ita_category'] = summarize(latencies, sum(latencies))
+
+    # Ranking against one skin colour, and in batch: the shipped catalogue's
+    # palette colours, then a large synthetic catalogue behind the KD-tree
+    from backend.colour import ColourIndex
+    from backend.recommendations import get_index
+    rng = np.random.default_rng(1)
+    large = ColourIndex('#{:02X}{:02X}{:02X}'.format(*c) for c in rng.integers(0, 256, (COLOUR_CATALOGUE_SIZE, 3)))
+    for catalogue in (get_index().colour_index, large):
+        latencies = []
+        for rgb in colours[:500]:
+            started = time.perf_counter()
+            catalogue.rank(rgb, k=10)
+            latencies.append(time.perf_counter() - started)
+        results[f'micro.colour_rank.{len(catalogue)}'] = summarize(latencies, sum(latencies))
+        started = time.perf_counter()
+        catalogue.rank_batch(colours, k=10)
+        elapsed = time.perf_counter() - started
+        results[f'micro.colour_rank_batch.{len(colours)}x{len(catalogue)}'] = summarize([elapsed / len(colours)] * len(colours), elapsed)
+    results.update(run_serialization_benchmarks(repeat))
+    return results
+
+
+def run_serialization_benchmarks(repeat):
+    """Response encoding on each installed JSON backend, and JSON extraction from model replies."""
+    from flask.json.provider import DefaultJSONProvider
+    from backend.model_providers import fake_answer, fake_result
+    from backend.serialization import BACKENDS, extract_json_object
+
+    rng = random.Random(0)
+    history = {'history': [{'id': i, 'type': 'skin_tone', 'engine': 'gemini', 'latency_ms': 800,
+                            'result': fake_result('skin_tone', rng), 'created_at': '2026-01-01T00:00:00'}
+                           for i in range(20)]}
+    results = {}
+    for name, backend_class in BACKENDS.items():
+        backend = backend_class()
+        latencies = []
+        for _ in range(repeat * 100):
+            started = time.perf_counter()
+            backend.dumps(history, default=DefaultJSONProvider.default, sort_keys=True)
+            latencies.append(time.perf_counter() - started)
+        results[f'micro.json_dumps.{name}.history20'] = summarize(latencies, sum(latencies))
+
+    merged_prompt = '[skin_tone]\n[body_shape]\n[skin_health]'
+    text = json.dumps(fake_answer(merged_prompt, rng), indent=2)
+    replies = {'bare': text, 'fenced': f"```json\n{text}\n```",
+               'chatty': f"Here is the analysis you asked for:\n{text}\nLet me know if you need more."}
+    for wrapping, reply in replies.items():
+        latencies = []
+        for _ in range(repeat * 100):
+            started = time.perf_counter()
+            extract_json_object(reply)
+            latencies.append(time.perf_counter() - started)
+        results[f'micro.extract_json.{wrapping}'] = summarize(latencies, sum(latencies))
+    return results
+
+
+# Run in a fresh interpreter: import the app, then the analysis stack that lazy
+# workers only load on their first analysis
+_STARTUP_PROBE = """
+import json, resource, time
+started = time.perf_counter()
+import backend.app
+imported = time.perf_counter()
+# ru_maxrss right after importing the app: what an idle worker holds
+app_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+import backend.skin_analysis
+from backend.recommendations import get_index
+get_index().colour_index
+analysis = time.perf_counter()
+from backend.startup import loaded_heavy_modules
+print(json.dumps({'import_app': imported - started, 'first_analysis_import': analysis - imported,
+                  'app_rss_mb': app_rss_mb, 'heavy_modules': loaded_heavy_modules()}))
+"""
+
+
+def run_accuracy_check(count):
+    """compare_fast_path() over `count` synthetic photos, as uploaded and as the routes prepare them."""
+    from backend.image_preprocessing import prepare_image
+    from backend.skin_analysis import compare_fast_path
+
+    images = [synthetic_image(1600, 1200, seed=seed) for seed in range(count)]
+    return {
+        'accuracy.fast_path.jpeg1600x1200': compare_fast_path(images),
+        'accuracy.fast_path.prepared': compare_fast_path([prepare_image(image).as_bgr_array() for image in images]),
+    }
+
+
+def run_startup_benchmarks(repeat):
+    """Cold start of a worker in fresh interpreters, lazy (default) and with the preload imports."""
+    results = {}
+    for mode, preload in (('lazy', 'false'), ('preload', 'true')):
+        # Default warm-up, with a key set as in production (building the client makes no call)
+        env = dict(os.environ, GUNICORN_PRELOAD=preload, LOG_LEVEL='WARNING')
+        env.setdefault('DATABASE_URL', 'sqlite://')
+        env.setdefault('GEMINI_API_KEY', 'benchmark-placeholder')
+        samples = []
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, '-c', _STARTUP_PROBE], capture_output=True, text=True, env=env,
+                                  cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            if proc.returncode != 0:
+                raise RuntimeError(proc.stderr[-2000:])
+            samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        for phase in ('import_app', 'first_analysis_import'):
+            latencies = [sample[phase] for sample in samples]
+            results[f'startup.{phase}.{mode}'] = summarize(latencies, sum(latencies))
+        results[f'startup.import_app.{mode}']['max_rss_mb'] = round(max(s['app_rss_mb'] for s in samples), 1)
+    return results
+
+
+def _proc_memory_mb(pid):
+    """(PSS, USS) of a process in MB from /proc (Linux only)."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    uss = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return round(fields.get('Pss', 0) / 1024, 1), round(uss / 1024, 1)
+
+
+def measure_gunicorn_workers(workers, preload, timeout=60):
+    """Starts gunicorn like the Procfile does and reports per-worker memory once it serves."""
+    import socket
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, GUNICORN_PRELOAD='true' if preload else 'false', LOG_LEVEL='WARNING', PYTHONPATH=root)
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='aura-bench-'), 'bench.db'))
+    env.setdefault('GEMINI_API_KEY', 'benchmark-placeholder')
+    master = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--chdir', 'backend', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+         'app:app'], cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    started = time.perf_counter()
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=1).read()
+                break
+            except OSError:
+                if master.poll() is not None or time.perf_counter() - started > timeout:
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.05)
+        ready = time.perf_counter() - started
+        time.sleep(0.5)  # let the remaining workers finish booting
+        with open(f'/proc/{master.pid}/task/{master.pid}/children') as f:
+            children = [int(pid) for pid in f.read().split()]
+        memory = [_proc_memory_mb(pid) for pid in children]
+        return {
+            'workers': len(children),
+            'ready_s': round(ready, 3),
+            'master_pss_mb': _proc_memory_mb(master.pid)[0],
+            'worker_pss_mb': round(sum(m[0] for m in memory) / max(len(memory), 1), 1),
+            'worker_uss_mb': round(sum(m[1] for m in memory) / max(len(memory), 1), 1),
+        }
+    finally:
+        master.terminate()
+        master.wait(timeout=30)
+
+
+def compare(results, baseline, tolerance):
+    """Regressions where p95 grew or throughput fell by more than `tolerance`."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or 'p95_ms' not in previous:
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if previous['throughput_rps'] and current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} rps")
+        if previous.get('max_rss_mb') and current.get('max_rss_mb', 0) > previous['max_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: RSS {previous['max_rss_mb']}MB -> {current['max_rss_mb']}MB")
+    return regressions
+
+
+def setup_app(model_latency, error_rate=0.0, malformed_rate=0.0, model_over_http=False):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='aura-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('GEMINI_WARMUP', 'false')
+    # Measure the app, not the rate limiter (set RATE_LIMIT_ENABLED=true to include it)
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+
+    from backend.app import create_app
+    from backend.analysis_cache import analysis_cache
+    from backend.config import Config
+    from backend.models import db, User
+
+    # Werkzeug's dev server logs every request at INFO on its own logger
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    install_fake_model(model_latency, error_rate, malformed_rate, model_over_http)
+    # Every request should pay for its analysis, not hit the result cache or
+    # reuse a result from the analysis history
+    analysis_cache.tiers = []
+    Config.ANALYSIS_HISTORY_CACHE = False
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@bench.local', password_hash='bench'))
+        db.session.commit()
+    return app
+
+
+def print_table(results):
+    print(f"{'benchmark':58} {'n':>6} {'err':>4} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:58} {r['requests']:>6} {r['errors']:>4} {r['throughput_rps'] or 0:>9} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AURA backend.")
+    parser.add_argument('--mode', choices=['inprocess', 'server', 'both'], default='inprocess')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('-n', '--requests', type=int, default=100, help="Requests per scenario")
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument('--gemini-latency-ms', type=float, default=50.0)
+    parser.add_argument('--gemini-jitter-ms', type=float, default=10.0)
+    parser.add_argument('--model-latency', help="Fake model latency spec, e.g. lognormal:800:0.4 "
+                                                "(overrides --gemini-latency-ms/--gemini-jitter-ms)")
+    parser.add_argument('--model-error-rate', type=float, default=0.0)
+    parser.add_argument('--model-malformed-rate', type=float, default=0.0)
+    parser.add_argument('--model-server', action='store_true',
+                        help="Serve the fake model over HTTP instead of calling it in-process")
+    parser.add_argument('--micro-repeat', type=int, default=10)
+    parser.add_argument('--skip-endpoints', action='store_true')
+    parser.add_argument('--skip-micro', action='store_true')
+    parser.add_argument('--skip-startup', action='store_true')
+    parser.add_argument('--accuracy-images', type=int, default=20,
+                        help="Synthetic photos for the fast-vs-full skin tone check (0 to skip)")
+    parser.add_argument('--startup-repeat', type=int, default=5)
+    parser.add_argument('--gunicorn-workers', type=int, default=0,
+                        help="Also boot gunicorn with this many workers, with and without preload, "
+                             "and report per-worker memory (Linux)")
+    parser.add_argument('--output', help="Write results as JSON")
+    parser.add_argument('--save-baseline', help="Write results to this baseline file")
+    parser.add_argument('--baseline', help="Compare against this baseline and fail on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    random.seed(0)
+    results = {}
+    if not args.skip_endpoints:
+        latency = args.model_latency or f'normal:{args.gemini_latency_ms}:{args.gemini_jitter_ms}'
+        app = setup_app(latency, args.model_error_rate, args.model_malformed_rate, args.model_server)
+        modes = ['inprocess', 'server'] if args.mode == 'both' else [args.mode]
+        scenarios = [s for s in args.scenarios.split(',') if s]
+        results.update(run_endpoint_benchmarks(app, modes, scenarios, args.requests, args.concurrency))
+    if not args.skip_micro:
+        results.update(run_micro_benchmarks(args.micro_repeat))
+    if not args.skip_startup:
+        results.update(run_startup_benchmarks(args.startup_repeat))
+
+    print_table(results)
+    for name, r in results.items():
+        if 'max_rss_mb' in r:
+            print(f"{name}: max RSS {r['max_rss_mb']} MB")
+    if args.accuracy_images:
+        for name, report in run_accuracy_check(args.accuracy_images).items():
+            results[name] = report
+            print(f"{name}: {report}")
+    if args.gunicorn_workers:
+        for preload in (False, True):
+            memory = measure_gunicorn_workers(args.gunicorn_workers, preload)
+            results[f"startup.gunicorn.{'preload' if preload else 'lazy'}"] = memory
+            print(f"gunicorn {'preload' if preload else 'lazy'}: {memory}")
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,32 +1,25 @@
-import psycopg2
-import os
-from dotenv import load_dotenv
+from sqlalchemy import inspect
 
-load_dotenv()
+from backend.db_pool import script_engine
 
 def check_schema():
-    url = os.environ.get('DATABASE_URL')
     try:
-        conn = psycopg2.connect(url)
-        cur = conn.cursor()
+        engine = script_engine()
+        inspector = inspect(engine)
         
         # Check tables
-        cur.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'")
-        tables = cur.fetchall()
-        print(f"Tables in database: {[t[0] for t in tables]}")
+        tables = inspector.get_table_names()
+        print(f"Tables in database: {tables}")
         
         # Check User table columns
-        if ('user',) in tables or 'user' in [t[0] for t in tables]:
-            cur.execute("SELECT column_name, data_type, is_nullable FROM information_schema.columns WHERE table_name = 'user'")
-            columns = cur.fetchall()
+        if 'user' in tables:
             print("User table columns:")
-            for col in columns:
-                print(f" - {col[0]}: {col[1]} (Nullable: {col[2]})")
+            for col in inspector.get_columns('user'):
+                print(f" - {col['name']}: {col['type']} (Nullable: {col['nullable']})")
         else:
             print("User table NOT found!")
             
-        cur.close()
-        conn.close()
+        engine.dispose()
     except Exception as e:
         print(f"Error checking schema: {e}")
 
@@ -8,5 +8,161 @@ class Config:
     # Default to sqlite if no DATABASE_URL provided, but intended for Postgres
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(os.path.abspath(os.path.dirname(__file__)), 'app.db')
+    # Heroku-style URLs use the scheme SQLAlchemy dropped in 1.4
+    if SQLALCHEMY_DATABASE_URI.startswith('postgres://'):
+        SQLALCHEMY_DATABASE_URI = 'postgresql://' + SQLALCHEMY_DATABASE_URI[len('postgres://'):]
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool (see backend/db_pool.py). Unset sizes are derived from the
+    # connection budget split across the gunicorn workers of this instance
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 1))
+    DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', 20))
+    DB_POOL_SIZE = int(os.environ['DB_POOL_SIZE']) if os.environ.get('DB_POOL_SIZE') else None
+    DB_MAX_OVERFLOW = int(os.environ['DB_MAX_OVERFLOW']) if os.environ.get('DB_MAX_OVERFLOW') else None
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # 'internal' (our own pool) or 'external' (PgBouncer or similar in transaction mode: no app-side pool)
+    DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'internal')
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000))
+    DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 5))
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+
+    # Analysis result cache (keyed by image hash + analysis type)
+    ANALYSIS_CACHE_ENABLED = os.environ.get('ANALYSIS_CACHE_ENABLED', 'true').lower() == 'true'
+    ANALYSIS_CACHE_MEMORY_ENTRIES = int(os.environ.get('ANALYSIS_CACHE_MEMORY_ENTRIES', 256))
+    ANALYSIS_CACHE_TTL = int(os.environ.get('ANALYSIS_CACHE_TTL', 7 * 24 * 3600))
+    # Optional on-disk tier shared by all workers on a node, e.g. /tmp/aura_analysis_cache.db
+    ANALYSIS_CACHE_PATH = os.environ.get('ANALYSIS_CACHE_PATH')
+    ANALYSIS_CACHE_DISK_ENTRIES = int(os.environ.get('ANALYSIS_CACHE_DISK_ENTRIES', 10000))
+    ANALYSIS_CACHE_DISK_BYTES = int(os.environ.get('ANALYSIS_CACHE_DISK_BYTES', 50 * 1024 * 1024))
+
+    # Analysis history (the `analysis` table) doubles as a result cache keyed by image hash
+    ANALYSIS_HISTORY_CACHE = os.environ.get('ANALYSIS_HISTORY_CACHE', 'true').lower() == 'true'
+    ANALYSIS_HISTORY_CACHE_MAX_AGE = int(os.environ.get('ANALYSIS_HISTORY_CACHE_MAX_AGE', 30 * 24 * 3600))
+
+    # 'auto' uses orjson when it is installed, else stdlib json ('orjson' / 'stdlib' to force)
+    JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')
+    # gzip (or br with the brotli package) for JSON/text responses when the client accepts it
+    RESPONSE_COMPRESSION = os.environ.get('RESPONSE_COMPRESSION', 'true').lower() == 'true'
+    RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+    RESPONSE_COMPRESSION_LEVEL = int(os.environ.get('RESPONSE_COMPRESSION_LEVEL', 6))
+
+    # Per-worker cache of rendered /profile responses; other workers see a write within the TTL
+    PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', 1024))
+    PROFILE_CACHE_TTL = float(os.environ.get('PROFILE_CACHE_TTL', 30))
+
+    # Background analysis jobs (?async=true on the analysis endpoints)
+    ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 4))
+    ANALYSIS_QUEUE_SIZE = int(os.environ.get('ANALYSIS_QUEUE_SIZE', 64))
+    ANALYSIS_JOB_TTL = int(os.environ.get('ANALYSIS_JOB_TTL', 3600))
+    # Set to a SQLite file so status polls work across gunicorn workers
+    ANALYSIS_JOB_STORE_PATH = os.environ.get('ANALYSIS_JOB_STORE_PATH')
+
+    # Analysis engine chain: engines are tried in order, each within its deadline
+    # (seconds). 'static' is the dummy-data last resort, appended when a chain leaves it out.
+    ANALYSIS_ENGINE_CHAIN = {
+        'default': os.environ.get('ANALYSIS_ENGINE_CHAIN', 'gemini,local,static'),
+        'skin_tone': os.environ.get('SKIN_TONE_ENGINE_CHAIN'),
+        'body_shape': os.environ.get('BODY_SHAPE_ENGINE_CHAIN'),
+        'skin_health': os.environ.get('SKIN_HEALTH_ENGINE_CHAIN'),
+    }
+    ANALYSIS_ENGINE_DEADLINES = os.environ.get('ANALYSIS_ENGINE_DEADLINES', 'gemini=10,local=3')
+    ANALYSIS_ENGINE_DEFAULT_DEADLINE = float(os.environ.get('ANALYSIS_ENGINE_DEFAULT_DEADLINE', 10))
+    # Start all engines at once and take the first good answer
+    ANALYSIS_ENGINE_RACE = os.environ.get('ANALYSIS_ENGINE_RACE', 'false').lower() == 'true'
+    # Threads per engine; each engine has its own pool so a slow one can't starve the rest
+    ANALYSIS_ENGINE_POOL_SIZE = int(os.environ.get('ANALYSIS_ENGINE_POOL_SIZE', 8))
+
+    # /api/analyze: 'concurrent' runs one engine chain per analysis in parallel,
+    # 'merged' asks Gemini for all of them in one prompt first
+    ANALYSIS_COMBINED_MODE = os.environ.get('ANALYSIS_COMBINED_MODE', 'concurrent')
+    ANALYSIS_COMBINED_POOL_SIZE = int(os.environ.get('ANALYSIS_COMBINED_POOL_SIZE', 12))
+
+    # Identical concurrent analyses (same image hash and type) share one run.
+    # Set ANALYSIS_SINGLE_FLIGHT_PATH to a SQLite file to coalesce across workers too.
+    ANALYSIS_SINGLE_FLIGHT = os.environ.get('ANALYSIS_SINGLE_FLIGHT', 'true').lower() == 'true'
+    ANALYSIS_SINGLE_FLIGHT_PATH = os.environ.get('ANALYSIS_SINGLE_FLIGHT_PATH')
+    ANALYSIS_SINGLE_FLIGHT_WAIT = float(os.environ.get('ANALYSIS_SINGLE_FLIGHT_WAIT', 30))
+    ANALYSIS_SINGLE_FLIGHT_LEASE = float(os.environ.get('ANALYSIS_SINGLE_FLIGHT_LEASE', 30))
+    LOCAL_ENGINE_FAST = os.environ.get('LOCAL_ENGINE_FAST', 'true').lower() == 'true'
+
+    # Gemini client, built once per worker process
+    GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-1.5-flash')
+    # 'grpc' (default, one multiplexed HTTP/2 channel) or 'rest' (pooled keep-alive session)
+    GEMINI_TRANSPORT = os.environ.get('GEMINI_TRANSPORT')
+    # Load the app and analysis stack in the gunicorn master (gunicorn.conf.py)
+    GUNICORN_PRELOAD = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+    # Build the model client when a worker starts rather than on its first model call.
+    # Defaults to on only with preload: a lazy worker would otherwise import the
+    # SDK and its gRPC stack (~50 MB) before serving any request
+    GEMINI_WARMUP = os.environ.get('GEMINI_WARMUP', str(GUNICORN_PRELOAD)).lower() == 'true'
+
+    # Admission control for the model-backed routes. Rates are tokens per second,
+    # one token per analysis; RATE_LIMIT_STORE_PATH shares buckets across workers.
+    # Onboarding (three single analyses, then /api/analyze) takes 6 tokens
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_USER_RATE = float(os.environ.get('RATE_LIMIT_USER_RATE', 0.5))
+    RATE_LIMIT_USER_BURST = float(os.environ.get('RATE_LIMIT_USER_BURST', 20))
+    RATE_LIMIT_GLOBAL_RATE = float(os.environ.get('RATE_LIMIT_GLOBAL_RATE', 10))
+    RATE_LIMIT_GLOBAL_BURST = float(os.environ.get('RATE_LIMIT_GLOBAL_BURST', 30))
+    RATE_LIMIT_STORE_PATH = os.environ.get('RATE_LIMIT_STORE_PATH')
+    ADMISSION_MAX_INFLIGHT = int(os.environ.get('ADMISSION_MAX_INFLIGHT', 32))
+    ADMISSION_RETRY_AFTER = float(os.environ.get('ADMISSION_RETRY_AFTER', 2))
+    # Proxies in front of the app that set X-Forwarded-For: 1 for the Heroku router
+    # (Procfile). Per-client rate limits key on the address they report, so without
+    # it every client shares one bucket; set 0 only when clients connect directly
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 1))
+    # Concurrent model calls per worker (or per host with GEMINI_SEMAPHORE_DIR), and
+    # how long a call may wait for a slot before falling back to the next engine
+    GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', 8))
+    GEMINI_QUEUE_TIMEOUT = float(os.environ.get('GEMINI_QUEUE_TIMEOUT', 2))
+    GEMINI_SEMAPHORE_DIR = os.environ.get('GEMINI_SEMAPHORE_DIR')
+
+    # Resilient Gemini calls: per-attempt timeout, retries with jittered exponential
+    # backoff inside an overall deadline (keep it under the engine-chain deadline),
+    # and a circuit breaker that skips the model after repeated failures
+    GEMINI_CALL_TIMEOUT = float(os.environ.get('GEMINI_CALL_TIMEOUT', 6))
+    GEMINI_TOTAL_DEADLINE = float(os.environ.get('GEMINI_TOTAL_DEADLINE', 9))
+    GEMINI_MAX_ATTEMPTS = int(os.environ.get('GEMINI_MAX_ATTEMPTS', 3))
+    GEMINI_BACKOFF_BASE = float(os.environ.get('GEMINI_BACKOFF_BASE', 0.25))
+    GEMINI_BACKOFF_MAX = float(os.environ.get('GEMINI_BACKOFF_MAX', 2))
+    GEMINI_MIN_ATTEMPT_TIME = float(os.environ.get('GEMINI_MIN_ATTEMPT_TIME', 0.5))
+    GEMINI_BREAKER_THRESHOLD = int(os.environ.get('GEMINI_BREAKER_THRESHOLD', 5))
+    GEMINI_BREAKER_RESET = float(os.environ.get('GEMINI_BREAKER_RESET', 30))
+
+    # Recommendation catalogue, held in memory and reloaded when the file changes
+    RECOMMENDATION_CATALOGUE_PATH = os.environ.get('RECOMMENDATION_CATALOGUE_PATH')
+    RECOMMENDATION_RELOAD_INTERVAL = float(os.environ.get('RECOMMENDATION_RELOAD_INTERVAL', 5))
+    RECOMMENDATION_MEMO_SIZE = int(os.environ.get('RECOMMENDATION_MEMO_SIZE', 4096))
+
+    # Model provider behind GeminiService: 'gemini', 'fake' (in-process stand-in)
+    # or 'http' (a model server such as backend.fake_model_server)
+    MODEL_PROVIDER = os.environ.get('MODEL_PROVIDER', 'gemini')
+    MODEL_PROVIDER_URL = os.environ.get('MODEL_PROVIDER_URL')
+    MODEL_PROVIDER_TIMEOUT = float(os.environ.get('MODEL_PROVIDER_TIMEOUT', 30))
+    # Fake provider behaviour; latency is a distribution spec in ms, e.g. 'lognormal:800:0.4'
+    FAKE_MODEL_LATENCY = os.environ.get('FAKE_MODEL_LATENCY', 'lognormal:800:0.4')
+    FAKE_MODEL_ERROR_RATE = float(os.environ.get('FAKE_MODEL_ERROR_RATE', 0.0))
+    FAKE_MODEL_MALFORMED_RATE = float(os.environ.get('FAKE_MODEL_MALFORMED_RATE', 0.0))
+    FAKE_MODEL_EMPTY_RATE = float(os.environ.get('FAKE_MODEL_EMPTY_RATE', 0.0))
+    FAKE_MODEL_SEED = int(os.environ['FAKE_MODEL_SEED']) if os.environ.get('FAKE_MODEL_SEED') else None
+
+    # Uploads are decoded once, downscaled and re-encoded before analysis
+    IMAGE_MAX_EDGE = int(os.environ.get('IMAGE_MAX_EDGE', 1024))
+    IMAGE_ENCODE_FORMAT = os.environ.get('IMAGE_ENCODE_FORMAT', 'JPEG')  # JPEG or WEBP
+    IMAGE_ENCODE_QUALITY = int(os.environ.get('IMAGE_ENCODE_QUALITY', 85))
+
+    # Uploads: hard cap on request size, per-part bytes kept in memory before
+    # spooling to a temp file, and a decompression-bomb guard
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_UPLOAD_MB', 15)) * 1024 * 1024
+    UPLOAD_SPOOL_THRESHOLD = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD', 256 * 1024))
+    UPLOAD_MAX_PIXELS = int(os.environ.get('UPLOAD_MAX_PIXELS', 50_000_000))
+
+    # Logging: JSON lines written by a background thread
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # json or text
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.1))
+    LOG_MAX_FIELD_BYTES = int(os.environ.get('LOG_MAX_FIELD_BYTES', 2048))
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
@@ -0,0 +1,149 @@
+"""Database engine and connection-pool settings.
+
+Each worker process gets its own pool. Unless DB_POOL_SIZE / DB_MAX_OVERFLOW
+are set, the pool is sized from the connection budget: DB_MAX_CONNECTIONS is
+split evenly across the WEB_CONCURRENCY workers. pool_size then covers the
+threads that use the DB at once (WEB_THREADS request threads plus
+ANALYSIS_WORKERS background jobs), and the rest of the worker's share is
+overflow. A full pool waits DB_POOL_TIMEOUT seconds, then fails.
+
+Connections are pinged on checkout and recycled after DB_POOL_RECYCLE seconds,
+so a Postgres restart or an idle timeout on a proxy doesn't surface as a
+failed request. On Postgres every statement runs under DB_STATEMENT_TIMEOUT_MS.
+
+DB_POOL_MODE=external is for a transaction-pooling proxy such as PgBouncer.
+The app then keeps no pool of its own (NullPool), and the statement timeout
+is set per transaction with SET LOCAL, since session settings would leak to
+other clients of the proxy.
+"""
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+from backend.config import Config
+from backend.metrics import DB_POOL_CHECKOUTS, DB_POOL_WAIT_SECONDS, registry
+
+
+class _TimedCheckout:
+    """Records how long getting a connection from the pool took."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except sa_exc.TimeoutError:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started, outcome='timeout')
+            raise
+        except Exception:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started, outcome='error')
+            raise
+        DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started, outcome='ok')
+        return record
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedNullPool(_TimedCheckout, NullPool):
+    pass
+
+
+def _is_postgres(url):
+    return url.get_backend_name() == 'postgresql'
+
+
+def pool_sizing(config=Config):
+    """(pool_size, max_overflow) for one worker process."""
+    per_worker = max(1, config.DB_MAX_CONNECTIONS // max(1, config.WEB_CONCURRENCY))
+    demand = config.WEB_THREADS + config.ANALYSIS_WORKERS
+    pool_size = config.DB_POOL_SIZE if config.DB_POOL_SIZE is not None else min(demand, per_worker)
+    if config.DB_MAX_OVERFLOW is not None:
+        return pool_size, config.DB_MAX_OVERFLOW
+    return pool_size, max(0, per_worker - pool_size)
+
+
+def _connect_args(url, config, session_timeout):
+    if not _is_postgres(url):
+        return {}
+    args = {'connect_timeout': config.DB_CONNECT_TIMEOUT}
+    if session_timeout and config.DB_STATEMENT_TIMEOUT_MS:
+        args['options'] = f'-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}'
+    return args
+
+
+def engine_options(uri, config=Config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the app's engine."""
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # Flask-SQLAlchemy gives in-memory SQLite a single static connection
+        return {}
+
+    options = {
+        'pool_pre_ping': config.DB_POOL_PRE_PING,
+        'connect_args': _connect_args(url, config, session_timeout=config.DB_POOL_MODE != 'external'),
+    }
+    if config.DB_POOL_MODE == 'external':
+        options['poolclass'] = InstrumentedNullPool
+        return options
+
+    pool_size, max_overflow = pool_sizing(config)
+    options.update({
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': config.DB_POOL_TIMEOUT,
+        'pool_recycle': config.DB_POOL_RECYCLE,
+        # Reuse the most recently returned connection, so idle extras age out via recycle
+        'pool_use_lifo': True,
+    })
+    return options
+
+
+def _set_local_statement_timeout(conn):
+    conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(Config.DB_STATEMENT_TIMEOUT_MS)}')
+
+
+_engine = None
+
+
+def instrument(engine, config=Config):
+    """Pool metrics for `engine`, plus the per-transaction timeout in external-pooler mode."""
+    global _engine
+    if (config.DB_POOL_MODE == 'external' and config.DB_STATEMENT_TIMEOUT_MS and _is_postgres(engine.url)
+            and not event.contains(engine, 'begin', _set_local_statement_timeout)):
+        event.listen(engine, 'begin', _set_local_statement_timeout)
+    if not event.contains(engine.pool, 'checkout', _count_checkout):
+        event.listen(engine.pool, 'checkout', _count_checkout)
+    # The most recently created app's engine is the one reported
+    _engine = engine
+
+
+def _pool_values():
+    # engine.pool is replaced by dispose(), so always read the current one
+    pool = _engine.pool if _engine is not None else None
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        ('size',): pool.size(),
+        ('checked_out',): pool.checkedout(),
+        ('idle',): pool.checkedin(),
+        ('overflow',): max(0, pool.overflow()),
+    }
+
+
+registry.callback('aura_db_pool_connections', 'Connections in the DB pool by state.', ('state',), _pool_values)
+
+
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKOUTS.inc()
+
+
+def script_engine(uri=None, **kwargs):
+    """Engine for one-off scripts (init_db, check_schema): no pool, same timeouts as the app."""
+    url = make_url(uri or Config.SQLALCHEMY_DATABASE_URI)
+    return create_engine(url, poolclass=NullPool, connect_args=_connect_args(url, Config, session_timeout=True),
+                         **kwargs)
@@ -0,0 +1,100 @@
+"""Stand-alone fake model server for load and latency testing.
+
+Serves the HttpProvider protocol on top of FakeProvider, so the app can be
+pointed at a separate process over real sockets:
+
+    python -m backend.fake_model_server --port 8765 --latency lognormal:800:0.4 --error-rate 0.02
+    MODEL_PROVIDER=http MODEL_PROVIDER_URL=http://127.0.0.1:8765 gunicorn --chdir backend app:app
+
+Simulated errors are answered with HTTP 503. GET /stats returns the counters.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.model_providers import FakeProvider
+
+
+class _Handler(BaseHTTPRequestHandler):
+    provider = None
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/healthz':
+            self._send(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            self._send(200, self.provider.stats())
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/v1/generate':
+            self._send(404, {'error': 'not found'})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            prompt = request['prompt']
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {'error': 'expected JSON with a prompt'})
+            return
+        outcome, delay, text = self.provider.respond(prompt)
+        time.sleep(delay)
+        self.provider.record(outcome, delay)
+        if outcome == 'error':
+            self._send(503, {'error': 'simulated model failure'})
+        else:
+            self._send(200, {'text': text})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(provider, host='127.0.0.1', port=8765):
+    handler = type('FakeModelHandler', (_Handler,), {'provider': provider})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_in_thread(provider, host='127.0.0.1', port=0):
+    """Starts a server on a background thread; returns (server, base_url)."""
+    server = make_server(provider, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Gemini-like model server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='lognormal:800:0.4',
+                        help="fixed:MS | uniform:MIN:MAX | normal:MEAN:SD | lognormal:MEDIAN:SIGMA | exponential:MEAN")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--empty-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    provider = FakeProvider(args.latency, args.error_rate, args.malformed_rate, args.empty_rate, args.seed)
+    server = make_server(provider, args.host, args.port)
+    print(f"Fake model server on http://{args.host}:{args.port} (latency {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
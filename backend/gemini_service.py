@@ -1,37 +1,19 @@
-import google.generativeai as genai
-from PIL import Image
-import io
-import json
+import logging
+import time
+from backend.admission import Overloaded, model_slots
+from backend.analysis_cache import analysis_cache, make_cache_key
 from backend.config import Config
+from backend.image_preprocessing import PreparedImage, prepare_image
+from backend.metrics import GEMINI_CALLS, GEMINI_RETRIES, GEMINI_SECONDS
+from backend.model_providers import get_provider
+from backend.resilience import CircuitBreaker, backoff_delay, is_transient, register_breaker_metrics
+from backend.serialization import extract_json_object
 
-class GeminiService:
-    @staticmethod
-    def get_model():
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        return genai.GenerativeModel('gemini-1.5-flash')
-
-    @staticmethod
-    def analyze_image(image_bytes, prompt):
-        try:
-            model = GeminiService.get_model()
-            img = Image.open(io.BytesIO(image_bytes))
-            
-            response = model.generate_content([prompt, img])
-            # Check if response has valid text
-            if response.candidates and response.candidates[0].content.parts:
-                text = response.candidates[0].content.parts[0].text
-                print(f"DEBUG Gemini Raw Output: {text}")
-                return text
-            else:
-                print(f"DEBUG Gemini Error: No content returned. Feedback: {response.prompt_feedback}")
-                return None
-        except Exception as e:
-            print(f"ERROR in GeminiService: {e}")
-            return None
+logger = logging.getLogger(__name__)
 
-    @staticmethod
-    def analyze_skin_tone(image_bytes):
-        prompt = """
+# Prompts per analysis type; the merged prompt is assembled from these
+PROMPTS = {
+    'skin_tone': """
         Analyze the skin tone and facial features in this image. 
         Provide a JSON response with the following fields:
         1. 'skin_tone': (e.g., Fair, Light, Medium, Tan, Deep)
@@ -41,13 +23,8 @@ class GeminiService:
         5. 'description': A brief explanation of the results.
         
         Return ONLY the raw JSON object.
-        """
-        result = GeminiService.analyze_image(image_bytes, prompt)
-        return GeminiService._parse_json(result)
-
-    @staticmethod
-    def analyze_body_shape(image_bytes):
-        prompt = """
+        """,
+    'body_shape': """
         Analyze the silhouette and body proportions in this image. 
         Provide a JSON response with the following fields:
         1. 'body_shape': (e.g., Hourglass, Pear, Apple, Rectangle, Inverted Triangle)
@@ -55,13 +32,8 @@ class GeminiService:
         3. 'styling_tips': A list of 3 quick styling tips for this body shape.
         
         Return ONLY the raw JSON object.
-        """
-        result = GeminiService.analyze_image(image_bytes, prompt)
-        return GeminiService._parse_json(result)
-
-    @staticmethod
-    def analyze_skin_health(image_bytes):
-        prompt = """
+        """,
+    'skin_health': """
         Analyze the skin texture and condition in this image (skincare focus). 
         Provide a JSON response with the following fields:
         1. 'skin_type': (e.g., Oily, Dry, Combination, Normal, Sensitive)
@@ -70,28 +42,187 @@ class GeminiService:
         4. 'description': A brief explanation and general advice.
         
         Return ONLY the raw JSON object.
-        """
-        result = GeminiService.analyze_image(image_bytes, prompt)
-        return GeminiService._parse_json(result)
+        """,
+}
+_RAW_JSON_LINE = "Return ONLY the raw JSON object."
+
+
+def merged_prompt(analysis_types):
+    """One prompt asking for several analyses, answered as {type: result, ...}."""
+    sections = []
+    for analysis_type in analysis_types:
+        body = PROMPTS[analysis_type].replace(_RAW_JSON_LINE, '').strip()
+        sections.append(f"[{analysis_type}]\n{body}")
+    keys = ', '.join(f'"{t}"' for t in analysis_types)
+    return (
+        "Answer several analyses of this image at once. Return ONE JSON object whose "
+        f"top-level keys are {keys}; each key holds the JSON object its section describes.\n\n"
+        + "\n\n".join(sections)
+        + "\n\nReturn ONLY the raw JSON object."
+    )
+
 
+gemini_breaker = CircuitBreaker('gemini', Config.GEMINI_BREAKER_THRESHOLD, Config.GEMINI_BREAKER_RESET)
+register_breaker_metrics(gemini_breaker)
+
+
+class GeminiService:
     @staticmethod
-    def _parse_json(text):
-        if not text:
+    def get_model():
+        # Only meaningful for the real Gemini provider
+        return get_provider().get_model()
+
+    @staticmethod
+    def warm_up():
+        # Build the client at startup so the first request doesn't pay for it
+        try:
+            get_provider().warm_up()
+        except Exception as e:
+            logger.warning("Model provider warm-up failed: %s", e)
+
+    @staticmethod
+    def client_stats():
+        stats = get_provider().stats()
+        stats['circuit'] = gemini_breaker.snapshot()
+        return stats
+
+    @staticmethod
+    def _prepared(image):
+        if isinstance(image, PreparedImage):
+            return image
+        return prepare_image(image)
+
+    @staticmethod
+    def analyze_image(image, prompt, parse=None):
+        """Model text for `prompt` about `image` (passed through `parse` if given), or None on failure.
+
+        The call goes through the configured model provider (MODEL_PROVIDER),
+        so the same path serves real Gemini and the offline fakes. Each attempt
+        holds one of GEMINI_MAX_CONCURRENCY slots and has its own timeout;
+        transient errors are retried with backoff, and the slot waits too, all
+        within GEMINI_TOTAL_DEADLINE. While the circuit breaker is open the
+        provider is not called at all. Empty text, or text `parse` turns into
+        None, counts as a failure for the breaker.
+        """
+        if not gemini_breaker.allow():
+            GEMINI_CALLS.inc(outcome='short_circuit')
+            logger.info("Gemini circuit open, skipping call")
             return None
         try:
-            # Better extraction for when models add extra conversational text
-            start = text.find('{')
-            end = text.rfind('}')
-            if start != -1 and end != -1:
-                json_text = text[start:end+1]
-                return json.loads(json_text)
-            
-            # Fallback to cleaning markdown
-            clean_text = text.replace('```json', '').replace('```', '').strip()
-            return json.loads(clean_text)
+            image = GeminiService._prepared(image)
+            text = GeminiService._call_with_retries(prompt, image)
+        except Overloaded as e:
+            gemini_breaker.release()
+            logger.warning("Skipping Gemini call: %s", e)
+            return None
         except Exception as e:
-            print(f"Error parsing Gemini JSON: {e} | Raw Output: {text[:200]}...")
+            gemini_breaker.record_failure()
+            logger.error("Gemini request failed: %s", e)
             return None
+        if text:
+            logger.debug("Gemini raw output", extra={'raw_output': text})
+        result = parse(text) if parse is not None else text
+        if result:
+            gemini_breaker.record_success()
+        else:
+            # The model answered, but nothing usable: as bad as an error for the breaker
+            gemini_breaker.record_failure()
+        return result
+
+    @staticmethod
+    def _call_with_retries(prompt, image):
+        deadline = time.monotonic() + Config.GEMINI_TOTAL_DEADLINE
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return GeminiService._attempt(prompt, image, deadline)
+            except Overloaded:
+                raise
+            except Exception as e:
+                delay = backoff_delay(attempt, Config.GEMINI_BACKOFF_BASE, Config.GEMINI_BACKOFF_MAX)
+                # Only retry if there's time left for a meaningful attempt after the pause
+                if (attempt >= Config.GEMINI_MAX_ATTEMPTS or not is_transient(e)
+                        or time.monotonic() + delay + Config.GEMINI_MIN_ATTEMPT_TIME > deadline):
+                    raise
+                GEMINI_RETRIES.inc()
+                logger.info("Retrying Gemini call in %.2fs after: %s", delay, e, extra={'attempt': attempt})
+                time.sleep(delay)
+
+    @staticmethod
+    def _attempt(prompt, image, deadline):
+        try:
+            slot = model_slots.acquire(timeout=deadline - time.monotonic())
+        except Overloaded:
+            GEMINI_CALLS.inc(outcome='rejected')
+            raise
+        # Whatever the slot wait left of the overall deadline bounds the call
+        timeout = min(Config.GEMINI_CALL_TIMEOUT, deadline - time.monotonic())
+        if timeout <= 0:
+            model_slots.release(slot)
+            GEMINI_CALLS.inc(outcome='rejected')
+            raise Overloaded("Deadline spent waiting for a model slot")
+        # Latency is measured from the slot being granted, excluding the wait for it
+        started = time.perf_counter()
+        try:
+            text = get_provider().generate(prompt, image, timeout=timeout)
+        except Exception as e:
+            outcome = 'timeout' if isinstance(e, TimeoutError) or type(e).__name__ == 'DeadlineExceeded' else 'error'
+            GEMINI_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+            GEMINI_CALLS.inc(outcome=outcome)
+            raise
+        finally:
+            model_slots.release(slot)
+        outcome = 'ok' if text else 'empty'
+        GEMINI_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+        GEMINI_CALLS.inc(outcome=outcome)
+        return text
+
+    @staticmethod
+    def analyze_skin_tone(image):
+        return GeminiService._cached_analysis('skin_tone', image, PROMPTS['skin_tone'])
+
+    @staticmethod
+    def analyze_body_shape(image):
+        return GeminiService._cached_analysis('body_shape', image, PROMPTS['body_shape'])
+
+    @staticmethod
+    def analyze_skin_health(image):
+        return GeminiService._cached_analysis('skin_health', image, PROMPTS['skin_health'])
+
+    @staticmethod
+    def analyze_merged(image, analysis_types):
+        """Several analyses from a single model call: {type: result or None}."""
+        analysis_types = list(analysis_types)
+        result = GeminiService._cached_analysis('merged:' + ','.join(analysis_types), image,
+                                                merged_prompt(analysis_types))
+        if not isinstance(result, dict):
+            return {t: None for t in analysis_types}
+        return {t: result.get(t) for t in analysis_types}
+
+    @staticmethod
+    def _cached_analysis(analysis_type, image, prompt):
+        # Identical photo + prompt always yields the cached answer, no model round trip
+        image = GeminiService._prepared(image)
+        key = make_cache_key(image.digest, analysis_type, prompt)
+        cached = analysis_cache.get(key)
+        if cached is not None:
+            return cached
+        result = GeminiService.analyze_image(image, prompt, parse=GeminiService._parse_json)
+        analysis_cache.set(key, result)
+        return result
+
+    @staticmethod
+    def cache_stats():
+        return analysis_cache.stats()
+
+    @staticmethod
+    def _parse_json(text):
+        # Handles bare, fenced and chatty replies (backend/serialization.py)
+        result = extract_json_object(text)
+        if result is None and text:
+            logger.warning("Could not parse Gemini JSON", extra={'raw_output': text[:200]})
+        return result
 
     @staticmethod
     def get_dummy_skin_tone():
@@ -0,0 +1,91 @@
+import hashlib
+import io
+
+from PIL import Image, ImageOps
+
+from backend.config import Config
+
+_MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+_EXIF_ORIENTATION = 0x0112
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+class PreparedImage:
+    """An upload decoded once and shared by every consumer of the request.
+
+    Holds the EXIF-oriented dimensions of the original, a content hash of the raw
+    bytes (for cache keys), the downscaled RGB image, and a compact re-encoding
+    of it for the model. The raw upload bytes themselves are not retained.
+    """
+
+    def __init__(self, digest, width, height, image, encoded, mime_type):
+        self.digest = digest
+        self.width = width
+        self.height = height
+        self.image = image
+        self.encoded = encoded
+        self.mime_type = mime_type
+        self._bgr = None
+
+    def as_blob(self):
+        """Inline blob for generate_content, so the SDK doesn't re-encode as lossless WebP."""
+        return {'mime_type': self.mime_type, 'data': self.encoded}
+
+    def as_bgr_array(self):
+        """OpenCV-style BGR array of the downscaled image, for the local analyzer."""
+        if self._bgr is None:
+            import numpy as np
+            self._bgr = np.ascontiguousarray(np.asarray(self.image)[:, :, ::-1])
+        return self._bgr
+
+
+def _hash_stream(stream, chunk_size=64 * 1024):
+    sha = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        sha.update(chunk)
+    stream.seek(0)
+    return sha.hexdigest()
+
+
+def prepare_image(source, max_edge=None, encode_format=None, quality=None):
+    """Builds a PreparedImage from raw bytes or a seekable binary stream.
+
+    Streams (e.g. a spooled upload) are hashed in chunks and decoded in place,
+    so the full upload is never copied into memory.
+    """
+    max_edge = max_edge or Config.IMAGE_MAX_EDGE
+    encode_format = (encode_format or Config.IMAGE_ENCODE_FORMAT).upper()
+    quality = quality or Config.IMAGE_ENCODE_QUALITY
+
+    if isinstance(source, (bytes, bytearray)):
+        digest = hashlib.sha256(source).hexdigest()
+        stream = io.BytesIO(source)
+    else:
+        stream = source
+        digest = _hash_stream(stream)
+    try:
+        img = Image.open(stream)
+        if img.width * img.height > Config.UPLOAD_MAX_PIXELS:
+            raise InvalidImage(f"Image has too many pixels ({img.width}x{img.height})")
+        # Dimensions as the user sees the photo, i.e. after EXIF rotation (read from the header)
+        width, height = img.size
+        if img.getexif().get(_EXIF_ORIENTATION) in (5, 6, 7, 8):
+            width, height = height, width
+        # JPEG draft mode lets libjpeg decode straight to a nearby smaller scale
+        img.draft('RGB', (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if max(img.size) > max_edge:
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    except InvalidImage:
+        raise
+    except Exception as e:
+        raise InvalidImage(f"Could not decode image: {e}")
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=encode_format, quality=quality)
+    return PreparedImage(digest, width, height, img, buffer.getvalue(), _MIME_TYPES[encode_format])
@@ -1,48 +1,33 @@
-import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
 from backend.config import Config
-import os
-from urllib.parse import urlparse
+from backend.db_pool import script_engine
 
 def create_database():
     try:
         # Parse the DATABASE_URL to get credentials and dbname
-        url = os.environ.get('DATABASE_URL')
-        if not url:
-            print("DATABASE_URL not found.")
+        url = make_url(Config.SQLALCHEMY_DATABASE_URI)
+        if url.get_backend_name() != 'postgresql':
+            print("DATABASE_URL is not a Postgres URL, nothing to create.")
             return
 
-        result = urlparse(url)
-        username = result.username
-        password = result.password
-        database = result.path[1:]
-        hostname = result.hostname
-        port = result.port
-        
-        # Connect to 'postgres' db to create the new db
-        con = psycopg2.connect(
-            dbname='postgres', 
-            user=username, 
-            host=hostname, 
-            password=password,
-            port=port
-        )
-        con.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        cur = con.cursor()
-        
-        # Check if db exists
-        cur.execute(f"SELECT 1 FROM pg_catalog.pg_database WHERE datname = '{database}'")
-        exists = cur.fetchone()
+        database = url.database
         
-        if not exists:
-            print(f"Database {database} does not exist. Creating...")
-            cur.execute(f"CREATE DATABASE {database}")
-            print(f"Database {database} created successfully.")
-        else:
-            print(f"Database {database} already exists.")
+        # Connect to 'postgres' db to create the new db (CREATE DATABASE can't run in a transaction)
+        engine = script_engine(url.set(database='postgres'), isolation_level='AUTOCOMMIT')
+        with engine.connect() as con:
+            # Check if db exists
+            exists = con.execute(text("SELECT 1 FROM pg_catalog.pg_database WHERE datname = :name"),
+                                 {'name': database}).first()
             
-        cur.close()
-        con.close()
+            if not exists:
+                print(f"Database {database} does not exist. Creating...")
+                con.execute(text(f"CREATE DATABASE {engine.dialect.identifier_preparer.quote(database)}"))
+                print(f"Database {database} created successfully.")
+            else:
+                print(f"Database {database} already exists.")
+        engine.dispose()
     except Exception as e:
         print(f"Error creating database: {e}")
 
@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.config import Config
+from backend.models import db, User
+from backend.analysis_tasks import ANALYSES, persist_analysis
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class MemoryJobStore:
+    """Job records for this worker process only."""
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def put(self, job):
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+            self._expire()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [k for k, v in self._jobs.items() if v['updated_at'] < cutoff]:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Job records in a SQLite file, so any gunicorn worker can answer a status poll."""
+
+    def __init__(self, path, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS analysis_jobs ("
+            " id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def put(self, job):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO analysis_jobs (id, data, updated_at) VALUES (?, ?, ?)",
+            (job['id'], json.dumps(job), job['updated_at']),
+        )
+        conn.execute("DELETE FROM analysis_jobs WHERE updated_at < ?", (time.time() - self.ttl,))
+
+    def get(self, job_id):
+        row = self._connect().execute(
+            "SELECT data FROM analysis_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class JobManager:
+    """Runs analyses on a bounded thread pool and persists results to the User row.
+
+    The pool is created on first submit rather than at import time so it is never
+    inherited across a fork. Submissions beyond `max_pending` queued/running jobs
+    are rejected with QueueFull instead of piling up in memory.
+    """
+
+    def __init__(self, max_workers, max_pending, store):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.store = store
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='analysis-job'
+            )
+            self._pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    def submit(self, app, analysis_type, image, user_id=None):
+        if analysis_type not in ANALYSES:
+            raise ValueError(f"Unknown analysis type: {analysis_type}")
+        with self._lock:
+            executor = self._get_executor()
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} analysis jobs already pending")
+            self._pending += 1
+
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'type': analysis_type,
+            'status': 'queued',
+            'progress': 0,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now,
+        }
+        self.store.put(job)
+        snapshot = dict(job)
+        try:
+            executor.submit(self._run, app, job, image, user_id)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return snapshot
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def pending(self):
+        return self._pending
+
+    def _update(self, job, **fields):
+        job.update(fields)
+        job['updated_at'] = time.time()
+        self.store.put(job)
+
+    def _run(self, app, job, image, user_id):
+        run, _ = ANALYSES[job['type']]
+        try:
+            # The app context gives the run access to the analysis history cache
+            with app.app_context():
+                self._update(job, status='running', progress=10)
+                result = run(image)
+                self._update(job, status='saving', progress=80)
+                user = db.session.get(User, user_id) if user_id else None
+                persist_analysis(user, job['type'], image, result)
+                db.session.commit()
+                if user:
+                    logger.info("Saved %s job result", job['type'], extra={'job_id': job['id'], 'user_id': user_id})
+            self._update(job, status='completed', progress=100, result=result)
+        except Exception as e:
+            logger.exception("Analysis job failed", extra={'job_id': job['id']})
+            self._update(job, status='failed', error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+def build_job_manager(config=Config):
+    if config.ANALYSIS_JOB_STORE_PATH:
+        store = SQLiteJobStore(config.ANALYSIS_JOB_STORE_PATH, ttl=config.ANALYSIS_JOB_TTL)
+    else:
+        store = MemoryJobStore(ttl=config.ANALYSIS_JOB_TTL)
+    return JobManager(config.ANALYSIS_WORKERS, config.ANALYSIS_QUEUE_SIZE, store)
+
+
+job_manager = build_job_manager()
@@ -0,0 +1,157 @@
+"""Structured JSON logging through a background queue.
+
+Application code logs with the standard `logging` module and passes context as
+`extra={...}`. Records are redacted and sampled on the calling thread, then put
+on an in-memory queue; a single listener thread formats and writes them, so a
+slow stdout never blocks a request.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import time
+
+from backend.config import Config
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'sampled'}
+SENSITIVE_KEYS = re.compile(r'pass(word)?|secret|token|api_?key|authorization|cookie', re.IGNORECASE)
+_INLINE_SECRET = re.compile(r"""(['"]?(?:password|password_hash|api_key|token)['"]?\s*[:=,]\s*\(?['"]?)([^'",)\s]+)""",
+                            re.IGNORECASE)
+
+
+def redact(value, max_bytes):
+    """Masks secret-looking fields and shortens anything larger than `max_bytes`."""
+    if isinstance(value, dict):
+        return {k: '[REDACTED]' if SENSITIVE_KEYS.search(str(k)) else redact(v, max_bytes)
+                for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v, max_bytes) for v in value[:50]]
+    if isinstance(value, (bytes, bytearray)):
+        return f'<{len(value)} bytes>'
+    if isinstance(value, str):
+        value = _INLINE_SECRET.sub(r'\1[REDACTED]', value)
+        if len(value) > max_bytes:
+            return f'{value[:max_bytes]}...<{len(value)} chars>'
+    return value
+
+
+class RedactingFilter(logging.Filter):
+    def __init__(self, max_bytes):
+        super().__init__()
+        self.max_bytes = max_bytes
+
+    def filter(self, record):
+        # Render the message now, while args are still the caller's objects
+        record.msg = redact(record.getMessage(), self.max_bytes)
+        record.args = None
+        for key in list(vars(record)):
+            if key in _RESERVED:
+                continue
+            if SENSITIVE_KEYS.search(key):
+                setattr(record, key, '[REDACTED]')
+            else:
+                setattr(record, key, redact(getattr(record, key), self.max_bytes))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps every record at INFO and above, and a fraction of DEBUG ones."""
+
+    def __init__(self, debug_rate):
+        super().__init__()
+        self.debug_rate = debug_rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.debug_rate >= 1:
+            return True
+        if random.random() < self.debug_rate:
+            record.sampled = self.debug_rate
+            return True
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED or key == 'sampled':
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_listener = None
+
+
+def _start_listener(log_queue, handler):
+    global _listener
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=False)
+    _listener.start()
+
+
+def configure_logging(config=Config):
+    """Routes the root logger through redaction, sampling and a queue-backed writer.
+
+    Safe to call more than once; the listener thread is restarted in forked
+    children (gunicorn --preload) since threads don't survive a fork.
+    """
+    root = logging.getLogger()
+    if getattr(root, '_aura_configured', False):
+        return
+    root._aura_configured = True
+
+    stream = logging.StreamHandler()
+    if config.LOG_FORMAT == 'json':
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    handler = _DroppingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(config.LOG_DEBUG_SAMPLE_RATE))
+    handler.addFilter(RedactingFilter(config.LOG_MAX_FIELD_BYTES))
+
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(config.LOG_LEVEL)
+
+    _start_listener(log_queue, stream)
+    # Flush whatever is still queued when the process exits
+    atexit.register(lambda: _listener and _listener.stop())
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: _restart_in_child(handler, stream, config.LOG_QUEUE_SIZE))
+
+
+def _restart_in_child(handler, stream, queue_size):
+    # A fresh queue: the inherited one's condition still lists the parent's
+    # listener as a waiter, so notify() would wake a thread that no longer exists
+    handler.queue = queue.Queue(maxsize=queue_size)
+    _start_listener(handler.queue, stream)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Drops records instead of blocking when the queue is full."""
+    dropped = 0
+
+    def prepare(self, record):
+        # The filters already rendered msg; skip QueueHandler's re-formatting
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
@@ -0,0 +1,269 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Each gunicorn worker keeps its own registry; scrape every worker (or run a
+single worker with threads) to get complete numbers.
+"""
+import bisect
+import threading
+import time
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name + _format_labels(self.labelnames, key), value
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+
+class CallbackMetric:
+    """Metric whose samples are computed at scrape time: fn() -> {labels tuple: value}."""
+
+    def __init__(self, name, documentation, labelnames, fn, kind='gauge'):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def samples(self):
+        try:
+            values = self.fn()
+        except Exception:
+            return
+        for key, value in values.items():
+            yield self.name + _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield self.name + '_bucket' + _format_labels(self.labelnames, key, [('le', le)]), cumulative
+            yield self.name + '_sum' + _format_labels(self.labelnames, key), total
+            yield self.name + '_count' + _format_labels(self.labelnames, key), count
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and 'outcome' in self.histogram.labelnames:
+            self.labels.setdefault('outcome', 'error')
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # Re-registering (e.g. a second create_app() in tests) returns the existing metric
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, labelnames, fn, kind='gauge'):
+        return self.register(CallbackMetric(name, documentation, labelnames, fn, kind))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for sample, value in metric.samples():
+                lines.append(f'{sample} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'aura_http_request_duration_seconds', 'HTTP request latency by endpoint.',
+    ('endpoint', 'method', 'status'))
+DB_QUERIES_PER_REQUEST = registry.histogram(
+    'aura_db_queries_per_request', 'SQL statements executed per HTTP request.',
+    ('endpoint',), buckets=COUNT_BUCKETS)
+DB_QUERY_SECONDS_PER_REQUEST = registry.histogram(
+    'aura_db_query_seconds_per_request', 'Total SQL time per HTTP request.', ('endpoint',))
+DB_QUERIES = registry.counter('aura_db_queries_total', 'SQL statements executed.', ('statement',))
+DB_POOL_WAIT_SECONDS = registry.histogram(
+    'aura_db_pool_wait_seconds', 'Time to get a connection from the DB pool.', ('outcome',))
+DB_POOL_CHECKOUTS = registry.counter('aura_db_pool_checkouts_total', 'Connections checked out of the DB pool.')
+COMPRESSED_RESPONSES = registry.counter(
+    'aura_http_compressed_responses_total', 'Responses sent compressed, by Content-Encoding.', ('encoding',))
+COMPRESSION_SAVED_BYTES = registry.counter(
+    'aura_http_compression_saved_bytes_total', 'Response body bytes saved by compression.')
+PROFILE_CACHE = registry.counter(
+    'aura_profile_cache_lookups_total', 'Profile cache lookups by outcome (hit, miss).', ('outcome',))
+PROFILE_NOT_MODIFIED = registry.counter(
+    'aura_profile_not_modified_total', '/profile requests answered 304 Not Modified.')
+USER_UPDATES = registry.counter(
+    'aura_user_updates_total', 'Profile writes issued (written) or skipped because nothing changed (noop).',
+    ('outcome',))
+GEMINI_SECONDS = registry.histogram(
+    'aura_gemini_request_duration_seconds', 'Gemini generate_content latency.', ('outcome',))
+GEMINI_CALLS = registry.counter('aura_gemini_requests_total', 'Gemini calls by outcome.', ('outcome',))
+GEMINI_RETRIES = registry.counter('aura_gemini_retries_total', 'Gemini attempts retried after a transient error.')
+ENGINE_SECONDS = registry.histogram(
+    'aura_analysis_engine_duration_seconds', 'Analysis engine latency (gemini, local, ...).',
+    ('analysis', 'engine', 'outcome'))
+LOCAL_ANALYSIS_SECONDS = registry.histogram(
+    'aura_local_analysis_duration_seconds', 'Local OpenCV skin-tone analysis latency.', ('mode',))
+ADMISSION_REJECTIONS = registry.counter(
+    'aura_admission_rejections_total', 'Requests refused by admission control.', ('reason',))
+SINGLE_FLIGHT = registry.counter(
+    'aura_analysis_single_flight_total',
+    'Analyses run (leader), coalesced in-process (follower) or shared across workers (shared).', ('role',))
+
+
+def _cache_values():
+    from backend.gemini_service import GeminiService
+    stats = GeminiService.cache_stats()
+    return {('hit',): stats['hits'], ('miss',): stats['misses']}
+
+
+def _job_values():
+    from backend.jobs import job_manager
+    return {(): job_manager.pending()}
+
+
+registry.callback('aura_analysis_cache_lookups_total', 'Analysis cache lookups by result.',
+                  ('result',), _cache_values, kind='counter')
+registry.callback('aura_analysis_jobs_pending', 'Queued or running analysis jobs.', (), _job_values)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's execution context, which is dropped with it even if
+    # the statement fails (so nothing accumulates on the pooled connection)
+    if context is not None:
+        context._aura_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_aura_query_started', None)
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    DB_QUERIES.inc(statement=statement.split(None, 1)[0].upper() if statement else '')
+    try:
+        g._db_queries = g.get('_db_queries', 0) + 1
+        g._db_seconds = g.get('_db_seconds', 0.0) + elapsed
+    except RuntimeError:
+        # Outside an app context (e.g. scripts); only the global counter applies
+        pass
+
+
+def _start_timer():
+    g._request_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('_request_started', None)
+    if started is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    if endpoint == 'metrics':
+        return response
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint,
+                                 method=request.method, status=response.status_code)
+    DB_QUERIES_PER_REQUEST.observe(g.get('_db_queries', 0), endpoint=endpoint)
+    DB_QUERY_SECONDS_PER_REQUEST.observe(g.get('_db_seconds', 0.0), endpoint=endpoint)
+    return response
+
+
+def metrics_view():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app, db):
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    with app.app_context():
+        engine = db.engine
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
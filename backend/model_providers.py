@@ -0,0 +1,388 @@
+"""Model providers behind GeminiService.analyze_image.
+
+A provider turns (prompt, PreparedImage) into the model's raw text answer, or
+None when the model returned nothing, within an optional timeout in seconds.
+Errors are raised, not swallowed; GeminiService retries and records them.
+
+- `gemini`: the real google.generativeai client (default).
+- `fake`: an in-process stand-in that answers the skin-tone, body-shape and
+  skin-health prompts with schema-valid JSON after a configurable latency,
+  and fails or returns malformed text at configurable rates.
+- `http`: posts the request to a model server speaking the small JSON
+  protocol of `backend.fake_model_server`, so load tests exercise real
+  sockets and a separate process.
+"""
+import abc
+import base64
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """The provider failed to produce an answer (simulated or transport error)."""
+
+    def __init__(self, message, transient=True):
+        super().__init__(message)
+        self.transient = transient
+
+
+class ProviderTimeout(ProviderError, TimeoutError):
+    pass
+
+
+class ModelProvider(abc.ABC):
+    name = 'base'
+
+    @abc.abstractmethod
+    def generate(self, prompt, image, timeout=None):
+        """The model's text answer for `prompt` about `image`, or None."""
+
+    def warm_up(self):
+        pass
+
+    def stats(self):
+        return {'provider': self.name}
+
+
+class GeminiProvider(ModelProvider):
+    """One configured GenerativeModel per worker process.
+
+    genai.configure() throws away the cached transport, so calling it per request
+    opened a fresh gRPC channel (or HTTP session) every time. The model and its
+    client are built once under a lock and reused; after a fork the child builds
+    its own, since gRPC channels must not be shared across processes.
+    """
+    name = 'gemini'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._model = None
+        self._client = None
+        self._pid = None
+        self._stats = {'calls': 0, 'setup_seconds': 0.0, 'model_seconds': 0.0, 'clients_built': 0}
+
+    def get_model(self):
+        if self._model is not None and self._pid == os.getpid():
+            return self._model
+        with self._lock:
+            if self._model is None or self._pid != os.getpid():
+                import google.generativeai as genai
+                from google.generativeai import client as genai_client
+
+                options = {'api_key': Config.GEMINI_API_KEY}
+                if Config.GEMINI_TRANSPORT:
+                    options['transport'] = Config.GEMINI_TRANSPORT
+                genai.configure(**options)
+                # Create the service client now rather than on the first generate_content;
+                # configure() reset the SDK's cache, and the model picks this one up from it
+                self._client = genai_client.get_default_generative_client()
+                self._model = genai.GenerativeModel(Config.GEMINI_MODEL)
+                self._pid = os.getpid()
+                self._stats['clients_built'] += 1
+        return self._model
+
+    def warm_up(self):
+        if Config.GEMINI_API_KEY:
+            self.get_model()
+
+    def generate(self, prompt, image, timeout=None):
+        started = time.perf_counter()
+        model = self.get_model()
+        # Downscaled, compact JPEG/WebP instead of the full-resolution upload
+        blob = image.as_blob()
+        called = time.perf_counter()
+        options = {'timeout': timeout} if timeout else None
+        response = model.generate_content([prompt, blob], request_options=options)
+        self._record(called - started, time.perf_counter() - called)
+        if response.candidates and response.candidates[0].content.parts:
+            return response.candidates[0].content.parts[0].text
+        logger.warning("Gemini returned no content", extra={'feedback': str(response.prompt_feedback)})
+        return None
+
+    def _record(self, setup_seconds, model_seconds):
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['setup_seconds'] += setup_seconds
+            self._stats['model_seconds'] += model_seconds
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        calls = stats['calls']
+        stats['provider'] = self.name
+        stats['model'] = Config.GEMINI_MODEL
+        stats['avg_setup_ms'] = round(stats['setup_seconds'] / calls * 1000, 3) if calls else 0.0
+        stats['avg_model_ms'] = round(stats['model_seconds'] / calls * 1000, 3) if calls else 0.0
+        return stats
+
+
+def parse_latency(spec):
+    """Builds a sampler returning seconds from a spec in milliseconds.
+
+    fixed:50 | uniform:20:80 | normal:50:10 | lognormal:50:0.5 (median, sigma)
+    | exponential:50 (mean). A bare number means fixed.
+    """
+    parts = str(spec or '0').strip().split(':')
+    if len(parts) == 1:
+        parts = ['fixed'] + parts
+    kind, args = parts[0].lower(), [float(p) for p in parts[1:]]
+    try:
+        if kind == 'fixed':
+            ms = lambda rng: args[0]
+        elif kind == 'uniform':
+            ms = lambda rng: rng.uniform(args[0], args[1])
+        elif kind == 'normal':
+            ms = lambda rng: rng.gauss(args[0], args[1])
+        elif kind == 'lognormal':
+            ms = lambda rng: rng.lognormvariate(math.log(args[0]), args[1])
+        elif kind == 'exponential':
+            ms = lambda rng: rng.expovariate(1 / args[0]) if args[0] else 0.0
+        else:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        ms(random.Random(0))
+    except IndexError:
+        raise ValueError(f"Missing parameters in latency spec: {spec}")
+    return lambda rng: max(0.0, ms(rng)) / 1000
+
+
+SKIN_TONES = ('Fair', 'Light', 'Medium', 'Tan', 'Deep')
+SEASONS = ('Spring', 'Summer', 'Autumn', 'Winter')
+BODY_SHAPES = ('Hourglass', 'Pear', 'Apple', 'Rectangle', 'Inverted Triangle')
+SKIN_TYPES = ('Oily', 'Dry', 'Combination', 'Normal', 'Sensitive')
+SKIN_CONCERNS = ('acne', 'redness', 'dullness', 'dryness', 'hyperpigmentation', 'fine lines')
+COLOUR_NAMES = ('Neon Pink', 'Icy Blue', 'Static Grey', 'Mustard', 'Olive', 'Pure White', 'Orange')
+STYLING_TIPS = (
+    "Emphasize the waist with belts or wrap tops.",
+    "V-necklines help balance the silhouette.",
+    "High-waisted bottoms lengthen the legs.",
+    "Structured shoulders add definition.",
+    "A-line skirts balance wider hips.",
+    "Monochrome outfits create a long, unbroken line.",
+)
+
+
+def detect_analysis_type(prompt):
+    """Which of the GeminiService prompts this is, from its distinctive wording."""
+    text = prompt.lower()
+    if 'silhouette' in text or 'body_shape' in text:
+        return 'body_shape'
+    if 'texture' in text or 'skin_type' in text:
+        return 'skin_health'
+    if 'skin tone' in text or 'skin_tone' in text:
+        return 'skin_tone'
+    return None
+
+
+def _merged_types(prompt):
+    # gemini_service.merged_prompt names its sections as [skin_tone], [body_shape], ...
+    return re.findall(r'^\[(\w+)\]$', prompt, re.MULTILINE)
+
+
+def fake_answer(prompt, rng):
+    """The JSON object the prompt asks for; merged prompts get one entry per section."""
+    merged = _merged_types(prompt)
+    if merged:
+        return {analysis_type: fake_result(analysis_type, rng) for analysis_type in merged}
+    return fake_result(detect_analysis_type(prompt), rng)
+
+
+def fake_result(analysis_type, rng):
+    """A random answer matching the JSON schema the given prompt asks for."""
+    if analysis_type == 'skin_tone':
+        return {
+            'skin_tone': rng.choice(SKIN_TONES),
+            'season': rng.choice(SEASONS),
+            'recommended_colors': ['#%06X' % rng.randrange(0x1000000) for _ in range(5)],
+            'avoid_colors': rng.sample(COLOUR_NAMES, 3),
+            'description': "Fake provider: simulated skin tone analysis.",
+        }
+    if analysis_type == 'body_shape':
+        return {
+            'body_shape': rng.choice(BODY_SHAPES),
+            'description': "Fake provider: simulated silhouette analysis.",
+            'styling_tips': rng.sample(STYLING_TIPS, 3),
+        }
+    if analysis_type == 'skin_health':
+        return {
+            'skin_type': rng.choice(SKIN_TYPES),
+            'concerns': rng.sample(SKIN_CONCERNS, rng.randint(0, 3)),
+            'confidence': rng.randint(60, 99),
+            'description': "Fake provider: simulated skin condition analysis.",
+        }
+    return {'description': "Fake provider: unrecognised prompt."}
+
+
+class FakeProvider(ModelProvider):
+    """Offline stand-in for Gemini with tunable latency and failure behaviour.
+
+    Each call sleeps for a sample of `latency`, then fails with `error_rate`,
+    returns nothing with `empty_rate`, returns text that is not valid JSON
+    with `malformed_rate`, and otherwise returns a schema-valid answer wrapped
+    the way the real model often wraps it (markdown fence or leading prose).
+    """
+    name = 'fake'
+
+    def __init__(self, latency='lognormal:800:0.4', error_rate=0.0, malformed_rate=0.0,
+                 empty_rate=0.0, seed=None):
+        self.latency_spec = latency
+        self._latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.empty_rate = empty_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'errors': 0, 'timeouts': 0, 'empty': 0, 'malformed': 0, 'ok': 0,
+                       'model_seconds': 0.0}
+
+    @classmethod
+    def from_config(cls, config=Config):
+        return cls(config.FAKE_MODEL_LATENCY, config.FAKE_MODEL_ERROR_RATE,
+                   config.FAKE_MODEL_MALFORMED_RATE, config.FAKE_MODEL_EMPTY_RATE, config.FAKE_MODEL_SEED)
+
+    def respond(self, prompt):
+        """Returns (outcome, delay_seconds, text); shared with the HTTP server."""
+        with self._lock:
+            # One RNG shared by all threads; draw everything for this call at once
+            delay = self._latency(self._rng)
+            roll = self._rng.random()
+            result = fake_answer(prompt, self._rng)
+            wrapping = self._rng.random()
+        if roll < self.error_rate:
+            return 'error', delay, None
+        roll -= self.error_rate
+        if roll < self.empty_rate:
+            return 'empty', delay, None
+        roll -= self.empty_rate
+        if roll < self.malformed_rate:
+            text = json.dumps(result)
+            return 'malformed', delay, text[:max(1, int(len(text) * wrapping))].replace('"', "'", 1)
+        text = json.dumps(result, indent=2)
+        if wrapping < 0.3:
+            text = f"```json\n{text}\n```"
+        elif wrapping < 0.5:
+            text = f"Here is the analysis you asked for:\n{text}"
+        return 'ok', delay, text
+
+    def generate(self, prompt, image, timeout=None):
+        outcome, delay, text = self.respond(prompt)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            self.record('timeout', timeout)
+            raise ProviderTimeout(f"Simulated model call exceeded {timeout:.2f}s")
+        time.sleep(delay)
+        self.record(outcome, delay)
+        if outcome == 'error':
+            raise ProviderError("Simulated model failure")
+        return text
+
+    def record(self, outcome, seconds):
+        key = {'error': 'errors', 'timeout': 'timeouts'}.get(outcome, outcome)
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats[key] += 1
+            self._stats['model_seconds'] += seconds
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(provider=self.name, latency=self.latency_spec, error_rate=self.error_rate,
+                     malformed_rate=self.malformed_rate, empty_rate=self.empty_rate)
+        stats['avg_model_ms'] = round(stats['model_seconds'] / stats['calls'] * 1000, 3) if stats['calls'] else 0.0
+        return stats
+
+
+class HttpProvider(ModelProvider):
+    """Client for a model server speaking the fake_model_server protocol.
+
+    POST {url}/v1/generate with {"prompt", "mime_type", "data" (base64)};
+    the server answers {"text": ...} (text may be null) or a non-2xx error.
+    """
+    name = 'http'
+
+    def __init__(self, url, timeout=30.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'errors': 0, 'model_seconds': 0.0}
+
+    def generate(self, prompt, image, timeout=None):
+        body = json.dumps({
+            'prompt': prompt,
+            'mime_type': image.mime_type,
+            'data': base64.b64encode(image.encoded).decode('ascii'),
+        }).encode()
+        req = urllib.request.Request(self.url + '/v1/generate', data=body,
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=min(self.timeout, timeout or self.timeout)) as response:
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            self._record(time.perf_counter() - started, error=True)
+            # 4xx means the request itself is wrong; retrying won't help
+            raise ProviderError(f"Model server returned {e.code}", transient=e.code >= 500 or e.code == 429) from e
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            self._record(time.perf_counter() - started, error=True)
+            raise ProviderError(f"Model server request failed: {e}") from e
+        self._record(time.perf_counter() - started)
+        return payload.get('text')
+
+    def _record(self, seconds, error=False):
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['errors'] += int(error)
+            self._stats['model_seconds'] += seconds
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(provider=self.name, url=self.url)
+        stats['avg_model_ms'] = round(stats['model_seconds'] / stats['calls'] * 1000, 3) if stats['calls'] else 0.0
+        return stats
+
+
+def build_provider(config=Config):
+    name = (config.MODEL_PROVIDER or 'gemini').lower()
+    if name == 'gemini':
+        return GeminiProvider()
+    if name == 'fake':
+        return FakeProvider.from_config(config)
+    if name == 'http':
+        if not config.MODEL_PROVIDER_URL:
+            raise ValueError("MODEL_PROVIDER=http needs MODEL_PROVIDER_URL")
+        return HttpProvider(config.MODEL_PROVIDER_URL, config.MODEL_PROVIDER_TIMEOUT)
+    raise ValueError(f"Unknown MODEL_PROVIDER: {name}")
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = build_provider()
+                logger.info("Model provider ready", extra={'provider': _provider.name})
+    return _provider
+
+
+def set_provider(provider):
+    """Swaps the process-wide provider (benchmarks, load tests); returns the old one."""
+    global _provider
+    with _provider_lock:
+        previous, _provider = _provider, provider
+    return previous
@@ -1,6 +1,8 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 
+from backend.serialization import model_serializer
+
 db = SQLAlchemy()
 
 class User(db.Model):
@@ -18,23 +20,47 @@ class User(db.Model):
     notifications_enabled = db.Column(db.Boolean, default=True)
     password_hash = db.Column(db.String(128)) # In production, store hash
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped by every profile write (user_repository.update_user); part of the /profile ETag
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Case-insensitive lookups and uniqueness (see backend/user_repository.py)
+        db.Index('ix_user_username_lower', db.func.lower(username), unique=True),
+        db.Index('ix_user_email_lower', db.func.lower(email), unique=True),
+    )
 
     def __repr__(self):
         return f'<User {self.username}>'
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'name': self.name,
-            'phone': self.phone,
-            'skin_tone': self.skin_tone,
-            'skin_type': self.skin_type,
-            'body_shape': self.body_shape,
-            'color_palette': self.color_palette,
-            'style_vibe': self.style_vibe,
-            'dark_mode': self.dark_mode,
-            'notifications_enabled': self.notifications_enabled,
-            'created_at': self.created_at.isoformat()
-        }
+    to_dict = model_serializer(
+        ('id', 'username', 'email', 'name', 'phone', 'skin_tone', 'skin_type', 'body_shape', 'color_palette',
+         'style_vibe', 'dark_mode', 'notifications_enabled', 'created_at', 'version', 'updated_at'),
+        isoformat=('created_at', 'updated_at'))
+
+
+class Analysis(db.Model):
+    """Append-only history of analysis results; also a result cache keyed by image hash."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    analysis_type = db.Column(db.String(32), nullable=False)  # skin_tone, body_shape, skin_health
+    image_hash = db.Column(db.String(64), nullable=False)  # sha256 of the uploaded file
+    engine = db.Column(db.String(32))
+    latency_ms = db.Column(db.Integer)
+    result = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Latest result per user and type: WHERE user_id = ? AND analysis_type = ? ORDER BY created_at DESC
+        db.Index('ix_analysis_user_type_created', user_id, analysis_type, created_at),
+        # Result cache lookups by uploaded image
+        db.Index('ix_analysis_hash_type_created', image_hash, analysis_type, created_at),
+    )
+
+    def __repr__(self):
+        return f'<Analysis {self.analysis_type} user={self.user_id}>'
+
+    to_dict = model_serializer(
+        {'id': 'id', 'user_id': 'user_id', 'type': 'analysis_type', 'image_hash': 'image_hash', 'engine': 'engine',
+         'latency_ms': 'latency_ms', 'result': 'result', 'created_at': 'created_at'},
+        isoformat=('created_at',))
@@ -0,0 +1,126 @@
+"""Read-through cache of rendered /profile responses, with strong ETags.
+
+An entry holds the serialized profile and its ETag, so a repeat fetch costs
+no DB query and, when the client sends the ETag back in If-None-Match, no body
+either. The ETag is the row's version plus a digest of the body: it changes
+whenever the bytes do.
+
+Every profile write goes through user_repository.update_user(), which marks
+the user dirty on the session; the entry is dropped once that transaction
+commits. A per-user generation counter stops a read that started before the
+commit from putting the old row back. The cache is per worker process: other
+workers notice a write within PROFILE_CACHE_TTL seconds, or immediately for a
+request sent with Cache-Control: no-cache.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.config import Config
+from backend.metrics import PROFILE_CACHE
+
+ProfileEntry = namedtuple('ProfileEntry', 'data body etag version')
+
+_DIRTY_KEY = 'profile_cache_dirty'
+
+
+def render(user):
+    """User row -> ProfileEntry for /profile."""
+    from flask import current_app
+
+    data = user.to_dict()
+    data['displayName'] = user.name or user.username
+    body = current_app.json.response(data).get_data()
+    etag = f"{user.version}-{hashlib.sha256(body).hexdigest()[:16]}"
+    return ProfileEntry(data, body, etag, user.version)
+
+
+class ProfileCache:
+    """username -> ProfileEntry, LRU with a TTL."""
+
+    def __init__(self, max_entries=1024, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        # username -> value of _clock at its last invalidation; _floor stands in for pruned names
+        self._generations = {}
+        self._clock = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, username, load, refresh=False):
+        """Cached entry for `username`, or load(username) -> User rendered and stored.
+
+        Returns None (and caches nothing) when the user doesn't exist.
+        """
+        key = username.lower()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and not refresh and time.monotonic() - entry[0] <= self.ttl:
+                self._data.move_to_end(key)
+                PROFILE_CACHE.inc(outcome='hit')
+                return entry[1]
+            generation = self._generations.get(key, self._floor)
+        PROFILE_CACHE.inc(outcome='miss')
+
+        user = load(username)
+        if user is None:
+            return None
+        entry = render(user)
+        if self.max_entries:
+            with self._lock:
+                # Skip the store if a write committed while we were reading
+                if self._generations.get(key, self._floor) == generation:
+                    self._data[key] = (time.monotonic(), entry)
+                    self._data.move_to_end(key)
+                    while len(self._data) > self.max_entries:
+                        self._data.popitem(last=False)
+        return entry
+
+    def invalidate(self, *usernames):
+        with self._lock:
+            self._clock += 1
+            for username in usernames:
+                key = username.lower()
+                self._data.pop(key, None)
+                self._generations[key] = self._clock
+            if len(self._generations) > 4 * max(self.max_entries, 64):
+                # Only reads in flight need the counters; moving the floor past
+                # every pruned value keeps those reads from storing
+                self._generations.clear()
+                self._clock += 1
+                self._floor = self._clock
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generations.clear()
+            self._clock += 1
+            self._floor = self._clock
+
+    def stats(self):
+        return {'entries': len(self._data), 'max_entries': self.max_entries, 'ttl': self.ttl}
+
+    def __len__(self):
+        return len(self._data)
+
+
+profile_cache = ProfileCache(Config.PROFILE_CACHE_SIZE, Config.PROFILE_CACHE_TTL)
+
+
+def mark_dirty(session, username):
+    """Drops `username` from the cache when the session's transaction ends."""
+    session.info.setdefault(_DIRTY_KEY, set()).add(username)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _invalidate_dirty(session):
+    # Also on rollback: dropping an entry that didn't change only costs one reload
+    dirty = session.info.pop(_DIRTY_KEY, None)
+    if dirty:
+        profile_cache.invalidate(*dirty)
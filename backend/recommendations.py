@@ -0,0 +1,219 @@
+"""Palette and outfit recommendations served from an in-memory catalogue.
+
+The catalogue (backend/data/recommendations.json, or RECOMMENDATION_CATALOGUE_PATH)
+is parsed once into a RecommendationIndex: outfits are indexed by occasion,
+weather, mood, body shape and style vibe, palettes by skin category and season,
+and every palette colour sits in a CIELAB colour index (backend/colour.py).
+Requests are answered from these indexes alone, with no DB or model round trip,
+and repeated queries hit a small memo on the index.
+
+The index is immutable and swapped atomically. Editing the file is picked up
+within RECOMMENDATION_RELOAD_INTERVAL seconds (a stat() per interval), or
+immediately through catalogue.reload() from a shell; there is no HTTP
+endpoint for it, since the API has no admin role to guard one. A catalogue
+that fails to parse is logged and the previous index keeps serving.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from functools import cached_property, lru_cache
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOGUE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'recommendations.json')
+
+# How much each matching attribute counts when ranking outfits
+DIMENSION_WEIGHTS = (
+    ('occasion', 'occasions', 8),
+    ('weather', 'weather', 4),
+    ('mood', 'moods', 2),
+    ('body_shape', 'body_shapes', 2),
+    ('style_vibe', 'style_vibes', 1),
+)
+
+
+def _key(value):
+    return value.strip().lower() if isinstance(value, str) else None
+
+
+class RecommendationIndex:
+    def __init__(self, catalogue, source=None, mtime=None):
+        self.source = source
+        self.mtime = mtime
+        self.version = catalogue.get('version')
+        self.loaded_at = time.time()
+
+        self.outfits = tuple(catalogue.get('outfits', []))
+        # dimension -> value -> frozenset of outfit positions; outfits with an empty
+        # tag list fit any value and sit in `_wildcards`
+        self._by_dimension = {}
+        self._wildcards = {}
+        for dimension, field, _ in DIMENSION_WEIGHTS:
+            values, wildcards = {}, set()
+            for position, outfit in enumerate(self.outfits):
+                tags = outfit.get(field) or []
+                if not tags:
+                    wildcards.add(position)
+                for tag in tags:
+                    values.setdefault(_key(tag), set()).add(position)
+            self._by_dimension[dimension] = {k: frozenset(v) for k, v in values.items()}
+            self._wildcards[dimension] = frozenset(wildcards)
+
+        # Skin categories ordered from the highest ITA threshold down
+        self.skin_categories = tuple(sorted(
+            ((c['min_ita'], c['name']) for c in catalogue.get('skin_categories', [])), reverse=True))
+        self._category_palettes = {
+            _key(c['name']): {'name': c['name'], 'recommended': tuple(c.get('palette', [])),
+                              'avoid': tuple(c.get('avoid', []))}
+            for c in catalogue.get('skin_categories', [])
+        }
+        self._season_palettes = {
+            _key(name): {'name': name, 'recommended': tuple(p.get('recommended', [])),
+                         'avoid': tuple(p.get('avoid', []))}
+            for name, p in catalogue.get('season_palettes', {}).items()
+        }
+        self._weather_seasons = {_key(k): v for k, v in catalogue.get('weather_seasons', {}).items()}
+        self._weather_outfits = {}
+        for season, by_gender in catalogue.get('weather_outfits', {}).items():
+            shared = tuple(by_gender.get('any', []))
+            for gender, items in by_gender.items():
+                self._weather_outfits[(_key(season), _key(gender))] = shared if gender == 'any' else tuple(items) + shared
+
+        self._colours = [c for p in (*self._category_palettes.values(), *self._season_palettes.values())
+                         for c in p['recommended']] + list(catalogue.get('colours', []))
+        self._candidates = lru_cache(maxsize=Config.RECOMMENDATION_MEMO_SIZE)(self._rank)
+
+    @cached_property
+    def colour_index(self):
+        # Built on first use so loading the catalogue doesn't need NumPy;
+        # startup.preload_analysis() builds it, and reloads rebuild it once it exists
+        from backend.colour import ColourIndex
+        return ColourIndex(self._colours)
+
+    def complementary_colours(self, lab, k=5):
+        """Catalogue colours closest (CIEDE2000) to the complement of a skin colour in CIELAB.
+
+        The complement keeps L* and mirrors a*/b*, so warm skin ranks cool shades first.
+        """
+        return self.colour_index.rank_lab([lab[0], -lab[1], -lab[2]], k)[0]
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'source': self.source,
+            'loaded_at': self.loaded_at,
+            'outfits': len(self.outfits),
+            'skin_categories': len(self.skin_categories),
+            'season_palettes': len(self._season_palettes),
+            'memo': self._candidates.cache_info()._asdict(),
+        }
+
+    def skin_category(self, ita):
+        """Skin category for an ITA angle in degrees (see backend/colour.py)."""
+        for threshold, name in self.skin_categories:
+            if ita > threshold:
+                return name
+        return self.skin_categories[-1][1] if self.skin_categories else None
+
+    def palette(self, category=None, season=None):
+        """Palette for a skin category or a season (category wins when both match)."""
+        for table, value in ((self._category_palettes, category), (self._season_palettes, season)):
+            found = table.get(_key(value))
+            if found:
+                return found
+        return None
+
+    def _rank(self, occasion, weather, mood, body_shape, style_vibe):
+        query = dict(occasion=occasion, weather=weather, mood=mood, body_shape=body_shape, style_vibe=style_vibe)
+        scores = [0] * len(self.outfits)
+        for dimension, _, weight in DIMENSION_WEIGHTS:
+            value = query[dimension]
+            if value is None:
+                continue
+            for position in self._by_dimension[dimension].get(value, frozenset()) | self._wildcards[dimension]:
+                scores[position] += weight
+        best = max(scores, default=0)
+        return tuple(p for p, score in enumerate(scores) if score == best)
+
+    def recommend(self, occasion=None, weather=None, mood=None, body_shape=None, style_vibe=None, seed=''):
+        """Best-matching outfit for the request; ties are spread across users by `seed`."""
+        candidates = self._candidates(_key(occasion), _key(weather), _key(mood), _key(body_shape), _key(style_vibe))
+        if not candidates:
+            return None
+        return self.outfits[candidates[zlib.crc32(seed.encode()) % len(candidates)]]
+
+    def weather_outfit(self, season=None, gender=None):
+        season = _key(season) or _key(current_season())
+        season = _key(self._weather_seasons.get(season, season))
+        return list(self._weather_outfits.get((season, _key(gender)))
+                    or self._weather_outfits.get((season, 'any'))
+                    or ())
+
+
+def current_season(month=None):
+    # Northern-hemisphere meteorological seasons
+    month = month or time.localtime().tm_mon
+    return ('Winter', 'Spring', 'Summer', 'Autumn')[(month % 12) // 3]
+
+
+def load_index(path):
+    with open(path) as f:
+        catalogue = json.load(f)
+    return RecommendationIndex(catalogue, source=path, mtime=os.stat(path).st_mtime)
+
+
+class Catalogue:
+    """Holds the current RecommendationIndex and reloads it when the file changes."""
+
+    def __init__(self, path, reload_interval=5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._index = None
+        self._checked_at = 0.0
+        self._failed_mtime = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        index = self._index
+        if index is None:
+            return self.reload(force=True)
+        if self.reload_interval and time.monotonic() - self._checked_at >= self.reload_interval:
+            return self.reload()
+        return index
+
+    def reload(self, force=False):
+        """Re-reads the catalogue if it changed (or always with force=True)."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            mtime = None
+            try:
+                mtime = os.stat(self.path).st_mtime
+                stale = self._index is None or mtime not in (self._index.mtime, self._failed_mtime)
+                if force or stale:
+                    index = load_index(self.path)
+                    if self._index is not None and 'colour_index' in self._index.__dict__:
+                        # The old index had its colour index built; don't leave the next analysis to do it
+                        index.colour_index
+                    self._index = index
+                    logger.info("Loaded recommendation catalogue",
+                                extra={'path': self.path, 'outfits': len(self._index.outfits)})
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                if self._index is None:
+                    raise
+                # Don't re-parse (and re-log) the same broken file every interval
+                self._failed_mtime = mtime
+                logger.error("Keeping previous recommendation catalogue: %s", e, extra={'path': self.path})
+            return self._index
+
+
+catalogue = Catalogue(Config.RECOMMENDATION_CATALOGUE_PATH or DEFAULT_CATALOGUE_PATH,
+                      Config.RECOMMENDATION_RELOAD_INTERVAL)
+
+
+def get_index():
+    return catalogue.get()
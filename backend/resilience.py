@@ -0,0 +1,122 @@
+"""Retry and circuit-breaker helpers for calls to the model provider.
+
+A failing or hung provider used to cost every request its full timeout.
+Transient errors are now retried a bounded number of times with jittered
+exponential backoff inside an overall deadline. After enough failures in a
+row the circuit opens and calls fail fast, so the engine chain goes straight
+to its fallbacks. Once `reset_timeout` has passed, one probe call is let
+through (half-open): success closes the circuit, failure opens it again.
+"""
+import random
+import threading
+import time
+
+from backend.metrics import registry
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+# google.api_core exception names worth retrying; matched by name so this
+# module doesn't need the Google client libraries installed
+TRANSIENT_ERROR_NAMES = {
+    'DeadlineExceeded', 'ServiceUnavailable', 'ResourceExhausted', 'TooManyRequests',
+    'InternalServerError', 'GatewayTimeout', 'BadGateway', 'Aborted', 'RetryError',
+}
+
+
+def is_transient(exc):
+    if getattr(exc, 'transient', None) is not None:
+        return exc.transient
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+def backoff_delay(attempt, base, cap, rng=random):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**(attempt-1))]."""
+    return rng.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._transitions = {CLOSED: 0, OPEN: 0, HALF_OPEN: 0}
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._move(HALF_OPEN)
+        return self._state
+
+    def _move(self, state):
+        if state != self._state:
+            self._state = state
+            self._transitions[state] += 1
+            if state == OPEN:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def allow(self):
+        """True if a call may go ahead; in half-open state only one probe at a time."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._move(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._move(OPEN)
+
+    def release(self):
+        """The allowed call ended without a verdict (e.g. it was never sent)."""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self):
+        with self._lock:
+            state = self._current_state()
+            retry_in = self.reset_timeout - (time.monotonic() - self._opened_at) if state == OPEN else 0.0
+            return {
+                'name': self.name,
+                'state': state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'retry_in_seconds': round(max(0.0, retry_in), 3),
+                'transitions': dict(self._transitions),
+            }
+
+
+def register_breaker_metrics(breaker):
+    def state_values():
+        state = breaker.state
+        return {(breaker.name, s): int(s == state) for s in (CLOSED, OPEN, HALF_OPEN)}
+
+    def transition_values():
+        return {(breaker.name, s): n for s, n in breaker.snapshot()['transitions'].items()}
+
+    registry.callback('aura_circuit_breaker_state', 'Circuit breaker state (1 for the current one).',
+                      ('breaker', 'state'), state_values)
+    registry.callback('aura_circuit_breaker_transitions_total', 'Circuit breaker state changes.',
+                      ('breaker', 'state'), transition_values, kind='counter')
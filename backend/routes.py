@@ -1,7 +1,24 @@
-from flask import Blueprint, request, jsonify
-from backend.models import db, User
-from backend.skin_analysis import analyze_skin_tone
+import logging
+from flask import Blueprint, request, jsonify, current_app, url_for
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from werkzeug.exceptions import HTTPException
+from backend.models import db
 from backend.gemini_service import GeminiService
+from backend.analysis_tasks import (
+    run_skin_tone, run_body_shape, run_skin_health,
+    ANALYSES, run_analyses, persist_analysis,
+)
+from backend.analysis_repository import record_analyses, analysis_history
+from backend.jobs import job_manager, QueueFull
+from backend.admission import admission_controlled
+from backend.recommendations import get_index
+from backend.image_preprocessing import prepare_image, InvalidImage
+from backend.uploads import get_image_upload, UploadRejected
+from backend.metrics import PROFILE_NOT_MODIFIED
+from backend.profile_cache import render as render_profile
+from backend.user_repository import get_user, get_profile, find_by_identifier, create_user, update_user, UserExists
+
+logger = logging.getLogger(__name__)
 
 main = Blueprint('main', __name__)
 
@@ -15,7 +32,6 @@ def index():
 
 @main.route('/login', methods=['POST'])
 def login():
-    print(f"DEBUG: Login request received. Form: {request.form}")
     identifier = request.form.get('username') # This could be username or email
     password = request.form.get('password')
     
@@ -23,7 +39,7 @@ def login():
         return "Missing username/email or password", 400
 
     # Check both username and email
-    user = User.query.filter((User.username == identifier) | (User.email == identifier)).first()
+    user = find_by_identifier(identifier)
     
     if user:
          # In a real app, verify password hash
@@ -37,12 +53,20 @@ def login():
 @main.app_errorhandler(Exception)
 def handle_exception(e):
     from flask import jsonify
-    print(f"CRITICAL ERROR: {e}")
+    if isinstance(e, HTTPException):
+        # Keep real HTTP errors (404, 405, 413 from MAX_CONTENT_LENGTH, ...) as they are
+        return jsonify({"error": e.description}), e.code
+    if isinstance(e, PoolTimeout):
+        # Every pooled DB connection stayed busy for DB_POOL_TIMEOUT; shed the request
+        logger.warning("DB pool exhausted: %s", e)
+        response = jsonify({"error": "Service is busy, please retry shortly"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    logger.exception("Unhandled error: %s", e)
     return jsonify({"error": str(e)}), 500
 
 @main.route('/signup', methods=['POST'])
 def signup():
-    print(f"DEBUG: Signup request received. Form: {request.form}")
     username = request.form.get('username')
     email = request.form.get('email')
     password = request.form.get('password')
@@ -50,24 +74,18 @@ def signup():
     phone = request.form.get('phone')
     
     if not username or not email or not password:
-        print(f"DEBUG: Missing fields. U:{username} E:{email} P:{'set' if password else 'none'}")
+        logger.info("Signup missing fields", extra={'username': username, 'email_set': bool(email), 'password_set': bool(password)})
         return jsonify({"error": "Missing required fields (username, email, password)"}), 400
     
-    if User.query.filter_by(username=username).first():
-        return "Username already exists", 400
-    
-    if User.query.filter_by(email=email).first():
-        print(f"DEBUG: Email {email} already exists")
-        return "Email already exists", 400
-        
     try:
-        new_user = User(username=username, email=email, password_hash=password, name=name, phone=phone)
-        db.session.add(new_user)
-        db.session.commit()
-        print(f"DEBUG: User {username} created successfully")
+        create_user(username, email, password_hash=password, name=name, phone=phone)
+        logger.info("User created", extra={'username': username})
+    except UserExists as e:
+        logger.info("Signup rejected: %s", e, extra={'username': username})
+        return str(e), 400
     except Exception as e:
         db.session.rollback()
-        print(f"DEBUG: Error during user creation: {e}")
+        logger.exception("Error during user creation: %s", e)
         return str(e), 500
     
     return jsonify({"success": True}), 200
@@ -79,17 +97,25 @@ def logout():
 @main.route('/profile', methods=['GET'])
 def profile():
     username = request.args.get('username')
-    if not username:
-        # Fallback to last user for demo, but prefer specific user
-        user = User.query.order_by(User.id.desc()).first()
+    if username:
+        # Cached per worker (backend/profile_cache.py); Cache-Control: no-cache reads the DB
+        entry = get_profile(username, refresh=bool(request.cache_control.no_cache))
     else:
-        user = User.query.filter_by(username=username).first()
-        
-    if user:
-        user_data = user.to_dict()
-        user_data['displayName'] = user.name or user.username
-        return jsonify(user_data), 200
-    return "No user found", 404
+        # Falls back to last user for demo; not cached, since any signup changes it
+        user = get_user()
+        entry = render_profile(user) if user else None
+
+    if entry is None:
+        return "No user found", 404
+    response = current_app.response_class(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    # Clients may keep the body but must revalidate; a match costs a bodiless 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.make_conditional(request)
+    if response.status_code == 304:
+        PROFILE_NOT_MODIFIED.inc()
+    return response
 
 @main.route('/api/submit-quiz', methods=['POST'])
 def submit_quiz():
@@ -99,83 +125,86 @@ def submit_quiz():
     fav_colors = request.form.get('fav_colors')
     avoid_colors = request.form.get('avoid_colors')
     
-    user = User.query.filter_by(username=username).first() if username else User.query.order_by(User.id.desc()).first()
+    user = get_user(username)
     if not user:
         return "User not found", 404
         
     # We can store these in User model or a new Quiz model. 
     # For now, let's repurpose style_vibe or add fields.
     # To keep it simple, let's just save style_vibe as the first style for now.
-    if styles:
-        user.style_vibe = styles.split(',')[0]
-    
     # In a real app, we'd have a StyleDNA table. 
     # For this demo, let's just confirm success.
-    db.session.commit()
+    if styles and update_user(user, style_vibe=styles.split(',')[0]):
+        db.session.commit()
     return jsonify({"success": True}), 200
 
 # --------------------------
 # Feature Endpoints
 # --------------------------
 
+def _wants_async():
+    flag = request.args.get('async') or request.form.get('async') or ''
+    return flag.lower() in ('1', 'true', 'yes')
+
+def _prepare_upload(*field_names):
+    # Validate type/magic bytes, then decode once straight from the spooled upload;
+    # the same PreparedImage feeds the checks, the local analyzer and Gemini
+    try:
+        file = get_image_upload(*field_names)
+        return prepare_image(file.stream), None
+    except UploadRejected as e:
+        return None, e.response()
+    except InvalidImage:
+        return None, (jsonify({"error": "Invalid image file"}), 400)
+
+def _enqueue_analysis(analysis_type, image, username):
+    user = get_user(username)
+    try:
+        job = job_manager.submit(current_app._get_current_object(), analysis_type, image,
+                                 user.id if user else None)
+    except QueueFull:
+        return jsonify({"error": "Analysis queue is full, please retry shortly"}), 503
+    return jsonify({
+        "job_id": job['id'],
+        "status": job['status'],
+        "status_url": url_for('main.check_status', job_id=job['id'])
+    }), 202
+
 @main.route('/api/skin-tone-detection', methods=['POST'])
+@admission_controlled()
 def skin_tone_detection():
     # Use provided username or last registered for demo
     username = request.form.get('username')
-    if 'profile_pic' not in request.files:
-        return jsonify({"error": "No image provided"}), 400
-        
-    file = request.files['profile_pic']
-    if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
-
-    # Read file into memory
-    file_bytes = file.read()
+    image, error = _prepare_upload('profile_pic')
+    if error:
+        return error
     
+    if _wants_async():
+        return _enqueue_analysis('skin_tone', image, username)
+
     # Use Gemini for better analysis
-    try:
-        result = GeminiService.analyze_skin_tone(file_bytes)
-    except Exception as e:
-        print(f"DEBUG: Gemini skin analysis error, using dummy: {e}")
-        result = None
-    
-    if not result:
-        # Final fallback to dummy
-        print("DEBUG: Using dummy skin analysis")
-        result = GeminiService.get_dummy_skin_tone()
+    result = run_skin_tone(image)
     
-    # Persistence
-    user = User.query.filter_by(username=username).first() if username else User.query.order_by(User.id.desc()).first()
+    # Persistence: profile fields plus a history row
+    user = get_user(username)
+    persist_analysis(user, 'skin_tone', image, result)
+    db.session.commit()
     if user:
-        user.skin_tone = result.get('skin_tone')
-        palette = result.get('recommended_colors', [])
-        if isinstance(palette, list):
-            user.color_palette = ",".join(palette)
-        else:
-            user.color_palette = str(palette)
-            
-        user.style_vibe = result.get('season')
-        db.session.commit()
-        print(f"DEBUG: Saved skin analysis for {user.username}")
+        logger.info("Saved skin analysis", extra={'username': username})
         
     return jsonify(result), 200
 
 @main.route('/api/body-shape-analysis', methods=['POST'])
+@admission_controlled()
 def body_shape_analysis():
     username = request.form.get('username')
-    
-    if 'image' not in request.files and 'profile_pic' not in request.files:
-         return jsonify({"error": "No image provided"}), 400
-         
-    file = request.files.get('image') or request.files.get('profile_pic')
-    file_bytes = file.read()
+    image, error = _prepare_upload('image', 'profile_pic')
+    if error:
+        return error
     
     # Mock Full Body Check
     # In a real app, this would use a model to check for persons presence and posture.
-    from PIL import Image
-    import io
-    img = Image.open(io.BytesIO(file_bytes))
-    width, height = img.size
+    width, height = image.width, image.height
     
     # Simple heuristic: Full body images are usually taller than they are wide (portrait)
     # If the image is not significantly taller than wide, we assume it's NOT full body.
@@ -184,70 +213,138 @@ def body_shape_analysis():
     if not is_full_body:
         return jsonify({"error": "Invalid image. Please upload a full-body image for accurate analysis"}), 400
 
-    try:
-        result = GeminiService.analyze_body_shape(file_bytes)
-    except Exception as e:
-        print(f"DEBUG: Gemini body analysis error, using dummy: {e}")
-        result = None
-    
-    if not result:
-        print("DEBUG: Using dummy body shape analysis")
-        result = GeminiService.get_dummy_body_shape()
+    if _wants_async():
+        return _enqueue_analysis('body_shape', image, username)
+
+    result = run_body_shape(image)
     
-    user = User.query.filter_by(username=username).first() if username else User.query.order_by(User.id.desc()).first()
-    if user:
-        user.body_shape = result.get('body_shape')
-        db.session.commit()
+    user = get_user(username)
+    persist_analysis(user, 'body_shape', image, result)
+    db.session.commit()
     return jsonify(result), 200
 
 # Dummies
 @main.route('/api/skin-analysis', methods=['POST'])
+@admission_controlled()
 def skin_analysis():
     username = request.form.get('username')
+    image, error = _prepare_upload('image')
+    if error:
+        return error
     
-    if 'image' not in request.files:
-         return jsonify({"error": "No image provided"}), 400
-         
-    file = request.files['image']
-    file_bytes = file.read()
-    
-    try:
-        result = GeminiService.analyze_skin_health(file_bytes)
-    except Exception as e:
-        print(f"DEBUG: Gemini skin health analysis error, using dummy: {e}")
-        result = None
-    
-    if not result:
-        print("DEBUG: Using dummy skin health analysis")
-        result = GeminiService.get_dummy_skin_health()
+    if _wants_async():
+        return _enqueue_analysis('skin_health', image, username)
+
+    result = run_skin_health(image)
     
-    user = User.query.filter_by(username=username).first() if username else User.query.order_by(User.id.desc()).first()
-    if user:
-        user.skin_type = result.get('skin_type')
-        db.session.commit()
+    user = get_user(username)
+    persist_analysis(user, 'skin_health', image, result)
+    db.session.commit()
     return jsonify(result), 200
 
+def _requested_analyses():
+    requested = request.form.get('analyses') or ','.join(ANALYSES)
+    return list(dict.fromkeys(t.strip() for t in requested.split(',') if t.strip()))
+
+def _analyze_cost():
+    # One token per distinct analysis; a request naming an unknown one is refused with 400, free
+    requested = _requested_analyses()
+    if any(t not in ANALYSES for t in requested):
+        return 0
+    return max(1, len(requested))
+
+@main.route('/api/analyze', methods=['POST'])
+@admission_controlled(cost=_analyze_cost)
+def combined_analysis():
+    # One upload for onboarding: runs the requested analyses together and saves them in one commit
+    username = request.form.get('username')
+    analysis_types = _requested_analyses()
+    unknown = [t for t in analysis_types if t not in ANALYSES]
+    if unknown:
+        return jsonify({"error": f"Unknown analyses: {', '.join(unknown)}"}), 400
+
+    image, error = _prepare_upload('image', 'profile_pic')
+    if error:
+        return error
+
+    errors = {}
+    if 'body_shape' in analysis_types and not image.height > image.width * 1.1:
+        # Same full-body heuristic as /api/body-shape-analysis; the other parts still run
+        analysis_types.remove('body_shape')
+        errors['body_shape'] = "Invalid image. Please upload a full-body image for accurate analysis"
+
+    results, failed = run_analyses(image, analysis_types)
+    errors.update(failed)
+
+    user = get_user(username)
+    if results:
+        if user:
+            # Every analysis' profile columns go out as a single UPDATE
+            fields = {}
+            for analysis_type, result in results.items():
+                fields.update(ANALYSES[analysis_type][1](result))
+            update_user(user, **fields)
+        record_analyses(user.id if user else None, image.digest, results)
+        db.session.commit()
+        logger.info("Saved combined analysis", extra={'username': username, 'analyses': list(results)})
+
+    status = 200 if results else 502
+    return jsonify({"results": results, "errors": errors}), status
+
 @main.route('/api/outfit-recommendation', methods=['POST'])
-def outfit_rec_dummy():
+def outfit_recommendation():
+    # Served from the in-memory catalogue (backend/recommendations.py), no model call
+    data = request.get_json(silent=True) or request.form
+    username = data.get('username')
+    profile = {k: data.get(k) for k in ('body_shape', 'style_vibe', 'skin_tone', 'season')}
+    if username and not all(profile.values()):
+        # Fill in attributes the client didn't send from the (usually cached) profile
+        entry = get_profile(username)
+        if entry:
+            user = entry.data
+            profile['body_shape'] = profile['body_shape'] or user['body_shape']
+            profile['skin_tone'] = profile['skin_tone'] or user['skin_tone']
+            # Skin tone analysis stores the colour season in style_vibe
+            profile['season'] = profile['season'] or user['style_vibe']
+            profile['style_vibe'] = profile['style_vibe'] or user['style_vibe']
+
+    index = get_index()
+    outfit = index.recommend(occasion=data.get('occasion'), weather=data.get('weather'), mood=data.get('mood'),
+                             body_shape=profile['body_shape'], style_vibe=profile['style_vibe'],
+                             seed=(username or '').lower())
+    if outfit is None:
+        return jsonify({"error": "No outfit recommendations available"}), 503
+    palette = index.palette(category=profile['skin_tone'], season=profile['season'])
     return jsonify({
-        "items": {
-            "top": "Blue Silk Blouse",
-            "bottom": "White Trousers",
-            "shoes": "Beige Heels",
-            "accessory": "Gold Necklace"
-        },
-        "reasoning": "Perfect for the occasion (Mock)",
-        "tips": "Add a scarf for flair."
+        "outfit_id": outfit['id'],
+        "items": outfit['items'],
+        "reasoning": outfit['reasoning'],
+        "tips": outfit['tips'],
+        "images": [],
+        "palette": {
+            "name": palette['name'],
+            "recommended": list(palette['recommended']),
+            "avoid": list(palette['avoid']),
+        } if palette else None,
     }), 200
 
 @main.route('/api/weather-outfit', methods=['POST'])
-def weather_outfit_dummy():
-    return jsonify({"recommendations": ["Coat", "Scarf"]}), 200
+def weather_outfit():
+    data = request.get_json(silent=True) or request.form
+    return jsonify({"recommendations": get_index().weather_outfit(data.get('season'), data.get('gender'))}), 200
 
 @main.route('/run_virtual_try_on', methods=['POST'])
 def vton_dummy():
     return jsonify({"status": "processing", "task_id": "123"}), 200
 
+@main.route('/check_status/<job_id>', methods=['GET'])
+@main.route('/api/jobs/<job_id>', methods=['GET'])
+def check_status(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job), 200
+
 @main.route('/check_status/<username>/<vton>/<garm>', methods=['GET'])
 def check_status_dummy(username, vton, garm):
     return jsonify({
@@ -256,6 +353,35 @@ def check_status_dummy(username, vton, garm):
         "img_two": "static/dummy_result_2.jpg"
     }), 200
 
+@main.route('/api/analysis-history', methods=['GET'])
+def get_analysis_history():
+    username = request.args.get('username')
+    analysis_type = request.args.get('type')
+    limit = min(request.args.get('limit', 20, type=int), 100)
+
+    user = get_user(username)
+    if not user:
+        return "User not found", 404
+    entries = analysis_history(user.id, analysis_type, limit)
+    return jsonify([entry.to_dict() for entry in entries]), 200
+
+@main.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify(GeminiService.cache_stats()), 200
+
+@main.route('/api/gemini-stats', methods=['GET'])
+def gemini_stats():
+    return jsonify(GeminiService.client_stats()), 200
+
+# /api/save-analysis `type` -> User column
+SAVE_ANALYSIS_COLUMNS = {
+    'skin': 'skin_tone',
+    'skin_type': 'skin_type',
+    'body': 'body_shape',
+    'color': 'color_palette',
+    'vibe': 'style_vibe',
+}
+
 @main.route('/api/save-analysis', methods=['POST'])
 def save_analysis():
     # Generic save endpoint for different analysis types
@@ -263,22 +389,13 @@ def save_analysis():
     analysis_type = request.form.get('type') # 'skin', 'body', 'color'
     value = request.form.get('value')
     
-    user = User.query.filter_by(username=username).first() if username else User.query.order_by(User.id.desc()).first()
+    user = get_user(username)
     if not user:
         return "User not found", 404
         
-    if analysis_type == 'skin':
-        user.skin_tone = value
-    elif analysis_type == 'skin_type':
-        user.skin_type = value
-    elif analysis_type == 'body':
-        user.body_shape = value
-    elif analysis_type == 'color':
-        user.color_palette = value
-    elif analysis_type == 'vibe':
-        user.style_vibe = value
-        
-    db.session.commit()
+    column = SAVE_ANALYSIS_COLUMNS.get(analysis_type)
+    if column and update_user(user, **{column: value}):
+        db.session.commit()
     return jsonify({"success": True}), 200
 
 @main.route('/api/update-settings', methods=['POST'])
@@ -287,14 +404,16 @@ def update_settings():
     dark_mode = request.form.get('dark_mode')
     notifications = request.form.get('notifications')
     
-    user = User.query.filter_by(username=username).first() if username else User.query.order_by(User.id.desc()).first()
+    user = get_user(username)
     if not user:
         return "User not found", 404
         
+    fields = {}
     if dark_mode is not None:
-        user.dark_mode = dark_mode.lower() == 'true'
+        fields['dark_mode'] = dark_mode.lower() == 'true'
     if notifications is not None:
-        user.notifications_enabled = notifications.lower() == 'true'
-        
-    db.session.commit()
+        fields['notifications_enabled'] = notifications.lower() == 'true'
+
+    if update_user(user, **fields):
+        db.session.commit()
     return jsonify({"success": True}), 200
@@ -0,0 +1,244 @@
+"""JSON encoding for API responses and decoding of model output.
+
+Responses go through a Flask JSON provider on a pluggable backend: orjson
+when it is installed (JSON_BACKEND=auto), otherwise the stdlib json module.
+Output matches Flask's (sorted keys, compact unless debugging, HTTP dates),
+except that non-ASCII text is sent as UTF-8 instead of \\u escapes.
+
+model_serializer() compiles a to_dict() per model that reads loaded column
+values straight from the instance, skipping the ORM's attribute machinery.
+
+compress_response() gzips JSON and text bodies of RESPONSE_COMPRESSION_MIN_BYTES
+or more when the client accepts it (br too, if the brotli package is installed).
+
+extract_json_object() pulls the JSON object out of a model reply, whether it is
+bare, fenced in ```json or wrapped in chatter, decoding in place.
+"""
+import gzip
+import json
+import logging
+from operator import attrgetter, itemgetter
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+from backend.config import Config
+from backend.metrics import COMPRESSED_RESPONSES, COMPRESSION_SAVED_BYTES
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class StdlibBackend:
+    name = 'stdlib'
+
+    def dumps(self, obj, default=None, sort_keys=False, indent=False):
+        if indent:
+            return json.dumps(obj, default=default, sort_keys=sort_keys, indent=2).encode()
+        return json.dumps(obj, default=default, sort_keys=sort_keys, separators=(',', ':')).encode()
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonBackend:
+    name = 'orjson'
+    # Dates go through `default` so they serialize as Flask's do (HTTP dates)
+    _BASE_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+                     if orjson else 0)
+
+    def __init__(self):
+        self._fallback = StdlibBackend()
+
+    def dumps(self, obj, default=None, sort_keys=False, indent=False):
+        option = self._BASE_OPTIONS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            # Integers over 64 bits, str subclasses and the like: json copes
+            return self._fallback.dumps(obj, default=default, sort_keys=sort_keys, indent=indent)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+BACKENDS = {'stdlib': StdlibBackend}
+if orjson is not None:
+    BACKENDS['orjson'] = OrjsonBackend
+
+
+def get_backend(name='auto'):
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in BACKENDS else 'stdlib'
+    if name not in BACKENDS:
+        logger.warning("JSON backend %r is not available, using stdlib json", name)
+        name = 'stdlib'
+    return BACKENDS[name]()
+
+
+backend = get_backend(Config.JSON_BACKEND)
+
+
+def dumps(obj, **kwargs):
+    """obj -> JSON bytes on the configured backend."""
+    return backend.dumps(obj, **kwargs)
+
+
+def loads(data):
+    return backend.loads(data)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider on the configured backend; jsonify() encodes straight to bytes."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # json.dumps options (cls, separators, ...) only the stdlib understands
+            return super().dumps(obj, **kwargs)
+        return backend.dumps(obj, default=self.default, sort_keys=self.sort_keys).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return backend.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = backend.dumps(obj, default=self.default, sort_keys=self.sort_keys, indent=indent) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def model_serializer(fields, isoformat=()):
+    """Compiles obj -> dict for a model.
+
+    `fields` maps output keys to attribute names (a sequence means the same
+    names); attributes listed in `isoformat` are datetimes sent as ISO 8601.
+    Loaded values are read from the instance __dict__ in one itemgetter call;
+    an expired or unloaded attribute falls back to normal attribute access.
+    """
+    if not isinstance(fields, dict):
+        fields = {name: name for name in fields}
+    keys = tuple(fields)
+    attributes = tuple(fields.values())
+    from_dict = itemgetter(*attributes)
+    from_attributes = attrgetter(*attributes)
+    dates = tuple(position for position, name in enumerate(attributes) if name in isoformat)
+
+    def to_dict(obj):
+        try:
+            values = from_dict(obj.__dict__)
+        except KeyError:
+            values = from_attributes(obj)
+        if len(attributes) == 1:
+            values = (values,)
+        if dates:
+            values = list(values)
+            for position in dates:
+                if values[position] is not None:
+                    values[position] = values[position].isoformat()
+        return dict(zip(keys, values))
+
+    return to_dict
+
+
+def _encode(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(Config.RESPONSE_COMPRESSION_LEVEL, 11))
+    return gzip.compress(data, compresslevel=Config.RESPONSE_COMPRESSION_LEVEL, mtime=0)
+
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/html')
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress_response(response):
+    """after_request hook: compresses the body if the client accepts an encoding we support."""
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if not encoding:
+        return response
+    data = response.get_data()
+    if len(data) < Config.RESPONSE_COMPRESSION_MIN_BYTES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    etag, weak = response.get_etag()
+    if etag:
+        # A strong ETag names exact bytes, so each encoding gets its own
+        response.set_etag(f'{etag}-{encoding}', weak)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+    compressed = _encode(data, encoding)
+    if len(compressed) >= len(data):
+        return response
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    COMPRESSED_RESPONSES.inc(encoding=encoding)
+    COMPRESSION_SAVED_BYTES.inc(len(data) - len(compressed))
+    return response
+
+
+def init_app(app):
+    app.json = JSONProvider(app)
+    if Config.RESPONSE_COMPRESSION:
+        app.after_request(compress_response)
+
+
+_decoder = json.JSONDecoder()
+
+
+def extract_json_object(text):
+    """The JSON object in a model reply, or None.
+
+    The object may be the whole reply, sit in a ```json fence, or follow a
+    chatty preface; anything after it is ignored. A bare reply goes to the fast
+    backend in one call. Otherwise the object is decoded in place from its first
+    '{' (JSONDecoder.raw_decode, no slicing or cleanup copies), then from the
+    first '{' inside a fence if that failed. Braces nested in a broken object
+    are never tried on their own, so a malformed reply is None, not a fragment.
+    """
+    if not text:
+        return None
+    start = text.find('{')
+    if start == -1:
+        return None
+    if not text[:start].strip():
+        try:
+            value = backend.loads(text)
+            return value if isinstance(value, dict) else None
+        except ValueError:
+            pass  # trailing chatter; raw_decode stops at the end of the object
+
+    candidates = [start]
+    fence = text.find('```')
+    if fence != -1:
+        fenced = text.find('{', fence)
+        if fenced not in (-1, start):
+            candidates.append(fenced)
+    for position in candidates:
+        try:
+            value, _ = _decoder.raw_decode(text, position)
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
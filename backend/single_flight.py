@@ -0,0 +1,200 @@
+"""Coalesces identical in-flight analyses so only one of them does the work.
+
+A retried upload of the same photo arrives while the first copy is still
+waiting on the model. `SingleFlight.do(key, fn)` lets the first caller for a
+key run `fn` and makes every concurrent caller with the same key wait for and
+share that result. With a `SQLiteLockStore` the same happens across gunicorn
+workers on one host: the first worker takes a lease row, the others poll it
+until the result is published.
+"""
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from backend.config import Config
+from backend.metrics import SINGLE_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SQLiteLockStore:
+    """Lease rows in a SQLite file shared by the workers of one host.
+
+    A row is inserted by the worker that runs the analysis and updated with the
+    result when it finishes. Leases expire so a crashed worker never blocks a
+    key for longer than `lease` seconds; finished results are kept for
+    `result_ttl` seconds for workers that are still polling.
+    """
+
+    def __init__(self, path, lease=30.0, result_ttl=10.0, poll_interval=0.05):
+        self.path = path
+        self.lease = lease
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS single_flight ("
+            " key TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " result TEXT)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def acquire(self, key, owner):
+        """('leader', None) if `owner` now holds the lease, ('done', result) if a
+        fresh result is already published, else ('wait', None)."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM single_flight WHERE expires_at < ?", (now,))
+            row = conn.execute("SELECT result FROM single_flight WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                conn.execute("INSERT INTO single_flight (key, owner, expires_at) VALUES (?, ?, ?)",
+                             (key, owner, now + self.lease))
+                state = ('leader', None)
+            elif row[0] is not None:
+                state = ('done', json.loads(row[0]))
+            else:
+                state = ('wait', None)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return state
+
+    def poll(self, key):
+        """('done', result), ('wait', None), or ('gone', None) when the lease vanished."""
+        row = self._connect().execute(
+            "SELECT result FROM single_flight WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return 'gone', None
+        if row[0] is None:
+            return 'wait', None
+        return 'done', json.loads(row[0])
+
+    def publish(self, key, owner, result):
+        conn = self._connect()
+        if result is None:
+            self.release(key, owner)
+            return
+        conn.execute("UPDATE single_flight SET result = ?, expires_at = ? WHERE key = ? AND owner = ?",
+                     (json.dumps(result), time.time() + self.result_ttl, key, owner))
+
+    def release(self, key, owner):
+        self._connect().execute("DELETE FROM single_flight WHERE key = ? AND owner = ?", (key, owner))
+
+
+class SingleFlight:
+    """Runs at most one `fn` per key at a time and shares its result with duplicates.
+
+    Callers that wait longer than `wait_timeout` stop waiting and run `fn`
+    themselves, so a stuck leader degrades to the uncoalesced behaviour.
+    """
+
+    def __init__(self, store=None, wait_timeout=30.0):
+        self.store = store
+        self.wait_timeout = wait_timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            SINGLE_FLIGHT.inc(role='follower')
+            if not call.done.wait(self.wait_timeout):
+                logger.warning("Gave up waiting on in-flight analysis", extra={'key': key})
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = self._run_shared(key, fn) if self.store is not None else self._run(fn)
+            return copy.deepcopy(call.result) if call.waiters else call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run(self, fn):
+        SINGLE_FLIGHT.inc(role='leader')
+        return fn()
+
+    def _run_shared(self, key, fn):
+        owner = uuid.uuid4().hex
+        try:
+            state, result = self.store.acquire(key, owner)
+        except sqlite3.Error as e:
+            logger.warning("Single-flight store unavailable: %s", e)
+            return self._run(fn)
+        if state == 'done':
+            SINGLE_FLIGHT.inc(role='shared')
+            return result
+        if state == 'wait':
+            state, result = self._wait_shared(key)
+            if state == 'done':
+                SINGLE_FLIGHT.inc(role='shared')
+                return result
+            # The other worker failed or timed out; run it here
+            return self._run(fn)
+
+        try:
+            result = self._run(fn)
+        except Exception:
+            self.store.release(key, owner)
+            raise
+        self.store.publish(key, owner, result)
+        return result
+
+    def _wait_shared(self, key):
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.store.poll_interval)
+            state, result = self.store.poll(key)
+            if state != 'wait':
+                return state, result
+        return 'timeout', None
+
+
+def build_single_flight():
+    store = None
+    if Config.ANALYSIS_SINGLE_FLIGHT_PATH:
+        store = SQLiteLockStore(Config.ANALYSIS_SINGLE_FLIGHT_PATH, lease=Config.ANALYSIS_SINGLE_FLIGHT_LEASE)
+    return SingleFlight(store, wait_timeout=Config.ANALYSIS_SINGLE_FLIGHT_WAIT)
+
+
+single_flight = build_single_flight()
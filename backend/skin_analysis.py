@@ -1,88 +1,207 @@
+import logging
+import time
+
 try:
     import cv2
     import numpy as np
-    from sklearn.cluster import KMeans
+    from backend.colour import ciede2000, ita_angle, srgb_to_lab
 except ImportError:
     cv2 = None
     np = None
-    KMeans = None
+    ciede2000 = ita_angle = srgb_to_lab = None
+
+from backend.recommendations import get_index
 
+logger = logging.getLogger(__name__)
 
-# 1. Diverse Fashion Mappings (from User)
-PALETTE_MAPPING = {
-    "Very Light": ["#E0115F", "#0047AB", "#FFFDD0", "#5D3FD3", "#00A36C"], # Ruby, Cobalt, Cream, Iris, Jade
-    "Light": ["#000080", "#FFDAB9", "#800020", "#4B0082", "#F5F5DC"],      # Navy, Peach, Burgundy, Indigo, Beige
-    "Intermediate": ["#FF7F50", "#008080", "#FAF9F6", "#DAA520", "#36454F"], # Coral, Teal, Off-White, Goldenrod, Charcoal
-    "Tan": ["#FFFFFF", "#FAF0E6", "#2E8B57", "#E6E6FA", "#4682B4"],          # White, Linen, Sea Green, Lavender, Steel Blue
-    "Brown": ["#FFD700", "#FAD5A5", "#00CED1", "#BC8F8F", "#FF8C00"],        # Gold, Sunset, Turquoise, Rose, Dark Orange
-    "Dark": ["#F5F5DC", "#FF00FF", "#00FF00", "#00FFFF", "#FFFFFF"]          # Ivory, Fuchsia, Lime, Cyan, Pure White
-}
 
 def get_ita_category(rgb):
     """Categorizes skin tone using ITA (Individual Typology Angle)"""
-    # Normalize RGB to 0-1
-    r, g, b = rgb / 255.0
-    # Simple conversion to L*a*b* (approximate) for ITA calculation
-    # Using the user's logic directly
-    val = (0.2126*r + 0.7152*g + 0.0722*b)
-    # Avoid log(0)
-    if val <= 0.008856:
-         L = 903.3 * val
-    else:
-         L = 116 * (val)**(1/3) - 16
-         
-    # The user code had a heuristic mapping based on brightness, not full ITA calculation completion
-    # Re-using User's heuristic:
-    brightness = np.mean(rgb)
-    if brightness > 200: return "Very Light"
-    if brightness > 150: return "Light"
-    if brightness > 120: return "Intermediate"
-    if brightness > 100: return "Tan"
-    if brightness > 60: return "Brown"
-    return "Dark"
-
-def analyze_skin_tone(image_path_or_buffer):
-    try:
-        if isinstance(image_path_or_buffer, str):
-            img = cv2.imread(image_path_or_buffer)
-        else:
-            # Assume buffer (e.g. from Flask request.files['file'].read())
-            nparr = np.frombuffer(image_path_or_buffer, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    ita = float(ita_angle(srgb_to_lab(rgb)))
+    return get_index().skin_category(ita)
+
+# Fast path tuning: JPEG DCT-domain downscale factor, pixels put through the
+# skin mask (the decoded image is strided down to about this many) and the
+# skin-pixel sample budget for clustering
+FAST_DECODE_REDUCTION = 8
+FAST_MIN_EDGE = 64
+FAST_MASK_BUDGET = 16384
+FAST_PIXEL_BUDGET = 4096
+FAST_MAX_ITER = 10
+
+_REDUCED_FLAGS = {2: 'IMREAD_REDUCED_COLOR_2', 4: 'IMREAD_REDUCED_COLOR_4', 8: 'IMREAD_REDUCED_COLOR_8'}
+
+
+def _decode_image(image_path_or_buffer, reduction=1):
+    if isinstance(image_path_or_buffer, np.ndarray):
+        # Already decoded (BGR), e.g. PreparedImage.as_bgr_array()
+        return image_path_or_buffer
+    flag = getattr(cv2, _REDUCED_FLAGS[reduction]) if reduction in _REDUCED_FLAGS else cv2.IMREAD_COLOR
+    if isinstance(image_path_or_buffer, str):
+        return cv2.imread(image_path_or_buffer, flag)
+    # Assume buffer (e.g. from Flask request.files['file'].read())
+    nparr = np.frombuffer(image_path_or_buffer, np.uint8)
+    return cv2.imdecode(nparr, flag)
+
+
+def decode_image(image_path_or_buffer, fast=False):
+    """Path, buffer or BGR array -> the BGR array analyze_skin_tone() works on, or None if it can't be decoded.
+
+    With fast=True the image is decoded at 1/FAST_DECODE_REDUCTION scale,
+    unless that would leave it under FAST_MIN_EDGE pixels on a side.
+    """
+    if not fast:
+        return _decode_image(image_path_or_buffer)
+    img = _decode_image(image_path_or_buffer, FAST_DECODE_REDUCTION)
+    if img is not None and min(img.shape[:2]) < FAST_MIN_EDGE:
+        # Already a small image; decode it at full size instead
+        img = _decode_image(image_path_or_buffer)
+    return img
+
+
+def _skin_pixels(img):
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV)
+    ycbcr = cv2.cvtColor(img, cv2.COLOR_RGB2YCrCb)
+
+    # Robust Multi-Space Masking (HSV + YCbCr)
+    mask_hsv = cv2.inRange(hsv, np.array([0, 15, 0]), np.array([25, 255, 255]))
+    mask_ycbcr = cv2.inRange(ycbcr, np.array([0, 133, 77]), np.array([255, 173, 127]))
+    final_mask = cv2.bitwise_and(mask_hsv, mask_ycbcr)
+
+    return img[final_mask > 0].reshape(-1, 3)
 
-        if img is None:
-            return None
 
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV)
-        ycbcr = cv2.cvtColor(img, cv2.COLOR_RGB2YCrCb)
+def dominant_skin_colour(pixels, n_clusters=3, max_iter=FAST_MAX_ITER):
+    """Pure-NumPy stand-in for KMeans(n_clusters=3) on a small pixel sample.
 
-        # Robust Multi-Space Masking (HSV + YCbCr)
-        mask_hsv = cv2.inRange(hsv, np.array([0, 15, 0]), np.array([25, 255, 255]))
-        mask_ycbcr = cv2.inRange(ycbcr, np.array([0, 133, 77]), np.array([255, 173, 127]))
-        final_mask = cv2.bitwise_and(mask_hsv, mask_ycbcr)
+    Centres are seeded deterministically at brightness quantiles, refined with
+    Lloyd iterations, and the brightest centre is returned, as in the KMeans path.
+    """
+    pixels = pixels.astype(np.float32)
+    order = np.argsort(pixels.sum(axis=1))
+    seeds = ((np.arange(n_clusters) + 0.5) / n_clusters * len(order)).astype(int)
+    centers = pixels[order[seeds]]
+    norms = (pixels * pixels).sum(axis=1)[:, None]
+    for _ in range(max_iter):
+        # Squared distances via the expansion |p|^2 - 2 p.c + |c|^2, no (N, K, 3) temporary
+        dists = norms - 2 * pixels @ centers.T + (centers * centers).sum(axis=1)
+        labels = dists.argmin(axis=1)
+        counts = np.bincount(labels, minlength=n_clusters).astype(np.float32)
+        # Per-channel weighted bincount; np.add.at is several times slower here
+        sums = np.stack([np.bincount(labels, pixels[:, c], n_clusters) for c in range(3)], axis=1)
+        empty = counts == 0
+        new_centers = np.where(empty[:, None], centers, sums / np.maximum(counts, 1)[:, None])
+        if np.allclose(new_centers, centers, atol=0.5):
+            centers = new_centers
+            break
+        centers = new_centers
+    return centers[np.argmax(centers.mean(axis=1))].astype(int)
 
-        skin_pixels = img[final_mask > 0].reshape(-1, 3)
+
+def _sample_grid(img, budget=FAST_MASK_BUDGET):
+    # A regular grid of about `budget` pixels; the same stride on both axes keeps the aspect
+    step = int((img.shape[0] * img.shape[1] / budget) ** 0.5)
+    if step < 2:
+        return img
+    return np.ascontiguousarray(img[::step, ::step])
+
+
+def _subsample(pixels, budget=FAST_PIXEL_BUDGET):
+    if len(pixels) <= budget:
+        return pixels
+    # Fixed stride keeps the sample deterministic and spread across the whole mask
+    step = len(pixels) / budget
+    return pixels[(np.arange(budget) * step).astype(int)]
+
+
+def _build_result(main_skin_rgb):
+    hex_code = '#{:02x}{:02x}{:02x}'.format(*main_skin_rgb)
+    lab = srgb_to_lab(main_skin_rgb)
+    ita = float(ita_angle(lab))
+    index = get_index()
+    category = index.skin_category(ita)
+    palette = index.palette(category=category)
+
+    return {
+        "skin_tone": hex_code,
+        "season": category,
+        "ita": round(ita, 1),
+        "lab": [round(float(v), 1) for v in lab],
+        "recommended_colors": list(palette['recommended']) if palette else [],
+        "avoid_colors": list(palette['avoid']) if palette else [],
+        "complementary_colors": [colour for colour, _ in index.complementary_colours(lab)],
+        "description": f"Detected skin tone: {category}"
+    }
+
+
+def analyze_skin_tone(image_path_or_buffer, fast=False):
+    """Detects the dominant skin colour and maps it to a fashion palette.
+
+    With fast=True the image is decoded at reduced resolution and strided down
+    to about FAST_MASK_BUDGET pixels before the skin mask; skin pixels are
+    subsampled to FAST_PIXEL_BUDGET and clustered with dominant_skin_colour()
+    instead of scikit-learn KMeans.
+    """
+    try:
+        img = decode_image(image_path_or_buffer, fast=fast)
+        if img is None:
+            return None
+        if fast:
+            # Mask a grid sample, not every pixel; already-decoded arrays (the
+            # routes' PreparedImage) come in at full working size
+            img = _sample_grid(img)
+
+        skin_pixels = _skin_pixels(img)
 
         if len(skin_pixels) > 50:
-            # 3. Use 3 clusters to find the actual skin
-            kmeans = KMeans(n_clusters=3, n_init='auto').fit(skin_pixels)
-            centers = kmeans.cluster_centers_
-            main_skin_rgb = centers[np.argmax(np.mean(centers, axis=1))].astype(int)
-            
-            hex_code = '#{:02x}{:02x}{:02x}'.format(*main_skin_rgb)
-            category = get_ita_category(main_skin_rgb)
-            fashion_palette = PALETTE_MAPPING.get(category, [])
-            
-            return {
-                "skin_tone": hex_code,
-                "season": category,
-                "recommended_colors": fashion_palette,
-                "avoid_colors": [], # No logic provided for avoid yet
-                "description": f"Detected skin tone: {category}"
-            }
+            if fast:
+                main_skin_rgb = dominant_skin_colour(_subsample(skin_pixels))
+            else:
+                # scikit-learn (and SciPy under it) is only needed here, not on the fast path
+                from sklearn.cluster import KMeans
+                # 3. Use 3 clusters to find the actual skin
+                kmeans = KMeans(n_clusters=3, n_init='auto').fit(skin_pixels)
+                centers = kmeans.cluster_centers_
+                main_skin_rgb = centers[np.argmax(np.mean(centers, axis=1))].astype(int)
+
+            return _build_result(main_skin_rgb)
         else:
             return None
     except Exception as e:
-        print(f"Error in analysis: {e}")
+        logger.warning("Error in skin tone analysis: %s", e)
         return None
+
+
+def compare_fast_path(images):
+    """Runs both paths over `images` (paths or buffers) and reports how often they agree.
+
+    Returns the share of images with the same season category, the mean
+    CIEDE2000 distance between the detected skin colours, and mean per-image
+    timings in ms.
+    """
+    matches = compared = total = 0
+    distances = []
+    timings = {'full_ms': 0.0, 'fast_ms': 0.0}
+    for image in images:
+        t0 = time.perf_counter()
+        full = analyze_skin_tone(image)
+        t1 = time.perf_counter()
+        fast = analyze_skin_tone(image, fast=True)
+        t2 = time.perf_counter()
+        total += 1
+        timings['full_ms'] += (t1 - t0) * 1000
+        timings['fast_ms'] += (t2 - t1) * 1000
+        if not full or not fast:
+            continue
+        compared += 1
+        matches += full['season'] == fast['season']
+        distances.append(float(ciede2000(full['lab'], fast['lab'])))
+    count = max(total, 1)
+    return {
+        'compared': compared,
+        'season_agreement': matches / compared if compared else None,
+        'mean_delta_e': float(np.mean(distances)) if distances else None,
+        'full_ms': timings['full_ms'] / count,
+        'fast_ms': timings['fast_ms'] / count,
+    }
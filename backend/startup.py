@@ -0,0 +1,110 @@
+"""Process startup: lazy analysis imports, gunicorn preload and import profiling.
+
+OpenCV, NumPy, scikit-learn and SciPy are only imported once an analysis
+actually runs (backend.analysis_engines imports backend.skin_analysis on first
+use), so a worker serving login/profile traffic never loads them.
+
+With GUNICORN_PRELOAD=true (see gunicorn.conf.py) the master builds the
+app and imports the analysis stack once; forked workers share those pages
+copy-on-write. Nothing that breaks across fork() is created before it: no
+threads, sockets or model clients. after_fork() then drops pooled DB
+connections inherited from the master and warms the model client per worker.
+
+    python -m backend.startup            # import-time profile of the app
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from backend.config import Config
+
+# Modules worth keeping out of workers that never run an analysis
+HEAVY_MODULES = ('cv2', 'numpy', 'sklearn', 'scipy', 'PIL', 'google.generativeai', 'grpc')
+
+
+def loaded_heavy_modules():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def preload_analysis():
+    """Imports the analysis stack in the gunicorn master, before workers fork."""
+    import backend.skin_analysis  # noqa: F401  (cv2, numpy)
+    from backend.recommendations import get_index
+    get_index().colour_index  # catalogue colours in CIELAB
+    if not Config.LOCAL_ENGINE_FAST:
+        import sklearn.cluster  # noqa: F401
+    if Config.MODEL_PROVIDER == 'gemini':
+        try:
+            # Import only; the client itself is built per worker in after_fork()
+            import google.generativeai  # noqa: F401
+        except ImportError:
+            pass
+
+
+def after_fork(app):
+    """Per-worker setup after forking from a preloaded master."""
+    from backend.gemini_service import GeminiService
+    from backend.models import db
+
+    with app.app_context():
+        # Connections opened in the master must not be shared between workers
+        db.engine.dispose(close=False)
+    if Config.GEMINI_WARMUP:
+        GeminiService.warm_up()
+
+
+def parse_importtime(stderr):
+    """-X importtime output -> [(module, self_us, cumulative_us)], in import order."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_profile(target='backend.app', env=None):
+    """Imports `target` in a fresh interpreter under -X importtime."""
+    code = (f"import {target}, json; from backend.startup import loaded_heavy_modules; "
+            "print(json.dumps(loaded_heavy_modules()))")
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                          env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{proc.stderr[-2000:]}")
+    rows = parse_importtime(proc.stderr)
+    total = next((cumulative for name, _, cumulative in rows if name == target), 0)
+    return {
+        'target': target,
+        'total_ms': total / 1000,
+        'heavy_modules': json.loads(proc.stdout.strip().splitlines()[-1]),
+        'modules': rows,
+    }
+
+
+def print_profile(profile, top=25):
+    print(f"import {profile['target']}: {profile['total_ms']:.0f} ms, "
+          f"heavy modules loaded: {profile['heavy_modules']}")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(profile['modules'], key=lambda r: -r[2])[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time profile of the backend.")
+    parser.add_argument('--target', default='backend.app', help="Module to import")
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--preload', action='store_true',
+                        help="Profile with GUNICORN_PRELOAD=true, i.e. what the master imports")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, GEMINI_WARMUP='false')
+    if args.preload:
+        env['GUNICORN_PRELOAD'] = 'true'
+    print_profile(import_profile(args.target, env), args.top)
+
+
+if __name__ == '__main__':
+    main()
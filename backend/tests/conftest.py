@@ -0,0 +1,62 @@
+import os
+
+# Config reads the environment at import time, so this runs before any backend import
+os.environ.update({
+    'DATABASE_URL': 'sqlite://',
+    'MODEL_PROVIDER': 'fake',
+    'FAKE_MODEL_LATENCY': 'fixed:0',
+    'GEMINI_WARMUP': 'false',
+    'RATE_LIMIT_ENABLED': 'false',
+    'LOG_LEVEL': 'WARNING',
+})
+
+import pytest  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    from backend.app import create_app
+    from backend.models import db
+    from backend.profile_cache import profile_cache
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    profile_cache.clear()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def statements(app):
+    """SQL statements run against the app's engine, e.g. ['SELECT', 'INSERT']."""
+    from backend.models import db
+
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement.split(None, 1)[0].upper())
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield seen
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+@pytest.fixture
+def photo():
+    """JPEG bytes of a synthetic portrait (tall enough for the full-body check)."""
+    from backend.benchmark import synthetic_image
+
+    def make(seed=0, width=480, height=640):
+        return synthetic_image(width, height, seed=seed)
+    return make
@@ -0,0 +1,91 @@
+import io
+
+import pytest
+
+from backend import admission
+from backend.config import Config
+
+
+@pytest.fixture
+def rate_limits(monkeypatch):
+    """Rate limiting on, with the configured (default) rates and fresh buckets."""
+    monkeypatch.setattr(Config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(admission, 'rate_limiter', admission._build_rate_limiter())
+
+
+def upload(client, path, image, client_ip='203.0.113.7', **form):
+    data = dict(form, image=(io.BytesIO(image), 'photo.jpg'), profile_pic=(io.BytesIO(image), 'photo.jpg'))
+    return client.post(path, data=data, content_type='multipart/form-data',
+                       headers={'X-Forwarded-For': client_ip})
+
+
+def test_onboarding_fits_default_rate_limit(client, rate_limits, photo):
+    client.post('/signup', data={'username': 'ann', 'email': 'ann@example.com', 'password': 'secret123'})
+    image = photo()
+    for path in ('/api/skin-tone-detection', '/api/body-shape-analysis', '/api/skin-analysis', '/api/analyze'):
+        assert upload(client, path, image, username='ann').status_code == 200, path
+    # ...and the user can still retake a photo afterwards
+    assert upload(client, '/api/skin-tone-detection', image, username='ann').status_code == 200
+
+
+def test_clients_behind_the_router_get_separate_buckets(client, rate_limits, photo, monkeypatch):
+    monkeypatch.setattr(Config, 'RATE_LIMIT_USER_RATE', 0.001)
+    monkeypatch.setattr(admission, 'rate_limiter', admission._build_rate_limiter())
+    image = photo()
+    burst = int(Config.RATE_LIMIT_USER_BURST)
+    for _ in range(burst):
+        assert upload(client, '/api/skin-tone-detection', image).status_code == 200
+    refused = upload(client, '/api/skin-tone-detection', image)
+    assert refused.status_code == 429
+    assert int(refused.headers['Retry-After']) >= 1
+    # Same proxy peer, different client address in X-Forwarded-For
+    assert upload(client, '/api/skin-tone-detection', image, client_ip='198.51.100.2').status_code == 200
+
+
+def test_empty_bucket_answers_429_without_running_the_analysis(client, photo, monkeypatch):
+    monkeypatch.setattr(Config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(admission, 'rate_limiter', admission.RateLimiter(
+        admission.MemoryBucketStore(), user_rate=0.001, user_burst=1, global_rate=0, global_burst=0))
+    calls = []
+    monkeypatch.setattr('backend.routes.run_skin_tone', lambda image: calls.append(image) or {'season': 'x'})
+    image = photo()
+    assert upload(client, '/api/skin-tone-detection', image).status_code == 200
+    response = upload(client, '/api/skin-tone-detection', image)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert len(calls) == 1
+
+
+def test_analyze_charges_one_token_per_known_analysis(client, photo, monkeypatch):
+    monkeypatch.setattr(Config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(admission, 'rate_limiter', admission.RateLimiter(
+        admission.MemoryBucketStore(), user_rate=0.001, user_burst=2, global_rate=0, global_burst=0))
+    image = photo()
+    # Three analyses cost more than the bucket holds: refused before any work
+    assert upload(client, '/api/analyze', image).status_code == 429
+    assert upload(client, '/api/analyze', image, analyses='skin_tone,bogus').status_code == 400
+    assert upload(client, '/api/analyze', image, analyses='skin_tone,skin_tone,skin_health').status_code == 200
+
+
+def test_inflight_cap_answers_503_even_without_rate_limits(client, photo, monkeypatch):
+    assert not Config.RATE_LIMIT_ENABLED
+    cap = admission.InflightLimiter(1)
+    monkeypatch.setattr(admission, 'inflight', cap)
+    assert cap.try_enter()  # another request holds the only place
+    response = upload(client, '/api/skin-tone-detection', photo())
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(int(Config.ADMISSION_RETRY_AFTER))
+    cap.leave()
+    assert upload(client, '/api/skin-tone-detection', photo()).status_code == 200
+    assert cap.current == 0
+
+
+def test_shared_bucket_store_charges_all_buckets_or_none(tmp_path):
+    store = admission.SQLiteBucketStore(str(tmp_path / 'buckets.db'))
+    buckets = [('user:a', 0.001, 2), ('global', 0.001, 3)]
+    assert store.take(buckets) == 0
+    assert store.take(buckets) == 0
+    assert store.take(buckets) > 0  # user:a is empty
+    # ...and the refused take left the global bucket its last token
+    assert store.take([('user:b', 0.001, 2), ('global', 0.001, 3)]) == 0
+    assert store.take([('user:b', 0.001, 2), ('global', 0.001, 3)]) > 0
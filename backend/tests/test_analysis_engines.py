@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from backend import analysis_engines
+from backend.config import Config
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    """skin_tone engines with a Gemini that hangs until released, and one thread per engine pool."""
+    release = threading.Event()
+    fake = {
+        'gemini': lambda image: release.wait(5) and {'season': 'model'},
+        'local': lambda image: {'season': 'local'},
+        'static': lambda: {'season': 'dummy'},
+    }
+    monkeypatch.setitem(analysis_engines.ENGINES, 'skin_tone', fake)
+    monkeypatch.setattr(Config, 'ANALYSIS_ENGINE_POOL_SIZE', 1)
+    monkeypatch.setattr(Config, 'ANALYSIS_ENGINE_DEADLINES', 'gemini=0.05,local=1')
+    monkeypatch.setattr(analysis_engines, '_executors', {})
+    yield fake
+    release.set()
+
+
+def test_hung_model_calls_dont_starve_the_local_engine(engines):
+    chain = ['gemini', 'local', 'static']
+    for _ in range(3):
+        # Each abandoned Gemini call still holds the only gemini thread
+        result = analysis_engines._run_chain('skin_tone', None, chain, race=False)
+        assert result == {'season': 'local', 'engine': 'local'}
+
+
+def test_chain_always_ends_in_static(engines, monkeypatch):
+    monkeypatch.setitem(engines, 'local', lambda image: None)
+    monkeypatch.setitem(Config.ANALYSIS_ENGINE_CHAIN, 'skin_tone', 'gemini,local')
+    chain = analysis_engines.get_chain('skin_tone')
+    assert chain == ['gemini', 'local', 'static']
+    assert analysis_engines._run_chain('skin_tone', None, chain, race=False)['engine'] == 'static'
@@ -0,0 +1,13 @@
+from backend.analysis_repository import find_cached_results, record_analysis
+from backend.models import db
+
+
+def test_only_model_results_are_reused(app):
+    with app.app_context():
+        for digest, engine in (('a', 'gemini'), ('b', 'local'), ('c', 'static')):
+            record_analysis(None, 'skin_tone', digest, {'engine': engine, 'season': 'Light'})
+        db.session.commit()
+        assert find_cached_results('a', ['skin_tone']) == {'skin_tone': {'engine': 'gemini', 'season': 'Light'}}
+        # A fallback answer from a model outage must not stick to the image
+        assert find_cached_results('b', ['skin_tone']) == {}
+        assert find_cached_results('c', ['skin_tone']) == {}
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from backend import colour
+from backend.colour import ColourIndex, ciede2000, ita_angle, srgb_to_lab
+
+# Sharma, Wu and Dalal (2005), "The CIEDE2000 color-difference formula:
+# implementation notes, supplementary test data and mathematical observations"
+SHARMA_PAIRS = [
+    ((50.0000, 2.6772, -79.7751), (50.0000, 0.0000, -82.7485), 2.0425),
+    ((50.0000, 3.1571, -77.2803), (50.0000, 0.0000, -82.7485), 2.8615),
+    ((50.0000, 2.8361, -74.0200), (50.0000, 0.0000, -82.7485), 3.4412),
+    ((50.0000, -1.3802, -84.2814), (50.0000, 0.0000, -82.7485), 1.0000),
+    ((50.0000, -1.1848, -84.8006), (50.0000, 0.0000, -82.7485), 1.0000),
+    ((50.0000, -0.9009, -85.5211), (50.0000, 0.0000, -82.7485), 1.0000),
+    ((50.0000, 0.0000, 0.0000), (50.0000, -1.0000, 2.0000), 2.3669),
+    ((50.0000, -1.0000, 2.0000), (50.0000, 0.0000, 0.0000), 2.3669),
+    ((50.0000, 2.4900, -0.0010), (50.0000, -2.4900, 0.0009), 7.1792),
+    ((50.0000, 2.4900, -0.0010), (50.0000, -2.4900, 0.0010), 7.1792),
+    ((50.0000, 2.4900, -0.0010), (50.0000, -2.4900, 0.0011), 7.2195),
+    ((50.0000, 2.4900, -0.0010), (50.0000, -2.4900, 0.0012), 7.2195),
+    ((50.0000, -0.0010, 2.4900), (50.0000, 0.0009, -2.4900), 4.8045),
+    ((50.0000, 2.5000, 0.0000), (73.0000, 25.0000, -18.0000), 27.1492),
+    ((50.0000, 2.5000, 0.0000), (61.0000, -5.0000, 29.0000), 22.8977),
+    ((50.0000, 2.5000, 0.0000), (56.0000, -27.0000, -3.0000), 31.9030),
+    ((50.0000, 2.5000, 0.0000), (58.0000, 24.0000, 15.0000), 19.4535),
+    ((50.0000, 2.5000, 0.0000), (50.0000, 3.1736, 0.5854), 1.0000),
+    ((60.2574, -34.0099, 36.2677), (60.4626, -34.1751, 39.4387), 1.2644),
+    ((63.0109, -31.0961, -5.8663), (62.8187, -29.7946, -4.0864), 1.2630),
+    ((61.2901, 3.7196, -5.3901), (61.4292, 2.2480, -4.9620), 1.8731),
+    ((35.0831, -44.1164, 3.7933), (35.0232, -40.0716, 1.5901), 1.8645),
+    ((22.7233, 20.0904, -46.6940), (23.0331, 14.9730, -42.5619), 2.0373),
+    ((36.4612, 47.8580, 18.3852), (36.2715, 50.5065, 21.2231), 1.4146),
+    ((90.8027, -2.0831, 1.4410), (91.1528, -1.6435, 0.0447), 1.4441),
+    ((90.9257, -0.5406, -0.9208), (88.6381, -0.8985, -0.7239), 1.5381),
+    ((6.7747, -0.2908, -2.4247), (5.8714, -0.0985, -2.2286), 0.6377),
+    ((2.0776, 0.0795, -1.1350), (0.9033, -0.0636, -0.5514), 0.9082),
+]
+
+
+@pytest.mark.parametrize('lab1, lab2, expected', SHARMA_PAIRS)
+def test_ciede2000_matches_sharma_reference_pairs(lab1, lab2, expected):
+    assert float(ciede2000(np.array(lab1), np.array(lab2))) == pytest.approx(expected, abs=1e-4)
+
+
+def test_ciede2000_is_vectorized_and_symmetric():
+    first = np.array([pair[0] for pair in SHARMA_PAIRS])
+    second = np.array([pair[1] for pair in SHARMA_PAIRS])
+    np.testing.assert_allclose(ciede2000(first, second), [pair[2] for pair in SHARMA_PAIRS], atol=1e-4)
+    np.testing.assert_allclose(ciede2000(first, second), ciede2000(second, first))
+
+
+def test_srgb_to_lab_reference_points():
+    np.testing.assert_allclose(srgb_to_lab([255, 255, 255]), [100, 0, 0], atol=0.01)
+    np.testing.assert_allclose(srgb_to_lab([0, 0, 0]), [0, 0, 0], atol=0.01)
+    np.testing.assert_allclose(srgb_to_lab([255, 0, 0]), [53.24, 80.09, 67.20], atol=0.05)
+    assert float(ita_angle(srgb_to_lab([255, 255, 255]))) == pytest.approx(90)
+
+
+def _random_catalogue(size, seed=1):
+    rng = np.random.default_rng(seed)
+    return ['#{:02X}{:02X}{:02X}'.format(*c) for c in rng.integers(0, 256, (size, 3))]
+
+
+def test_small_catalogue_is_ranked_exactly():
+    index = ColourIndex(_random_catalogue(100))
+    query = np.array([200, 150, 120])
+    ranked = index.rank(query, k=5)
+    deltas = ciede2000(srgb_to_lab(query), index.lab)
+    assert [c for c, _ in ranked] == [index.colours[p] for p in np.argsort(deltas, kind='stable')[:5]]
+    assert [d for _, d in ranked] == sorted(d for _, d in ranked)
+
+
+def test_large_catalogue_tree_finds_nearly_all_of_the_exact_top_k(monkeypatch):
+    pytest.importorskip('scipy')
+    catalogue = _random_catalogue(colour.INDEX_MIN_SIZE * 4)
+    indexed = ColourIndex(catalogue)
+    monkeypatch.setattr(colour, 'INDEX_MIN_SIZE', len(catalogue) + 1)
+    exact = ColourIndex(catalogue)
+    assert indexed._tree is not None and exact._tree is None
+
+    queries = np.random.default_rng(0).integers(0, 256, (100, 3))
+    found = [len({c for c, _ in a} & {c for c, _ in b})
+             for a, b in zip(indexed.rank_batch(queries), exact.rank_batch(queries))]
+    assert sum(found) / (10 * len(queries)) >= 0.97
+
+
+def test_batches_are_chunked_without_changing_results(monkeypatch):
+    index = ColourIndex(_random_catalogue(50))
+    queries = np.random.default_rng(0).integers(0, 256, (40, 3))
+    whole = index.rank_batch(queries, k=3)
+    monkeypatch.setattr(colour, 'BATCH_TERMS', 64)  # one query at a time
+    assert index.rank_batch(queries, k=3) == whole
+    assert index.rank_batch(queries[:0]) == []
@@ -0,0 +1,62 @@
+from backend.models import db
+from backend.profile_cache import mark_dirty, profile_cache
+from backend.user_repository import get_user
+
+
+def signup(client, username='bob'):
+    client.post('/signup', data={'username': username, 'email': f'{username}@example.com', 'password': 'secret123'})
+
+
+def test_write_drops_the_entry_when_it_commits(client, statements):
+    signup(client)
+    first = client.get('/profile?username=bob')
+    assert first.get_json()['dark_mode'] is True
+
+    client.post('/api/update-settings', data={'username': 'bob', 'dark_mode': 'false'})
+    statements.clear()
+    second = client.get('/profile?username=bob')
+    assert second.get_json()['dark_mode'] is False
+    assert statements == ['SELECT']  # reloaded once, then cached again
+    assert second.headers['ETag'] != first.headers['ETag']
+    # The old ETag no longer matches, the new one does
+    assert client.get('/profile?username=bob', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+    assert client.get('/profile?username=bob', headers={'If-None-Match': second.headers['ETag']}).status_code == 304
+
+
+def test_read_racing_a_commit_does_not_store_the_old_row(app, client):
+    signup(client)
+    loads = []
+
+    def load_then_commit_elsewhere(username):
+        user = get_user(username)
+        loads.append(user.version)
+        # Another request's write commits while this read is still rendering
+        profile_cache.invalidate(username)
+        return user
+
+    with app.test_request_context():
+        entry = profile_cache.get('bob', load_then_commit_elsewhere)
+        assert entry.data['username'] == 'bob'
+        assert len(profile_cache) == 0
+        profile_cache.get('bob', load_then_commit_elsewhere)
+    assert len(loads) == 2
+
+
+def test_rolled_back_write_still_drops_the_entry(app, client):
+    signup(client)
+    client.get('/profile?username=bob')
+    assert len(profile_cache) == 1
+    with app.app_context():
+        get_user('bob')  # the write's transaction is open
+        mark_dirty(db.session, 'BOB')
+        assert len(profile_cache) == 1  # nothing happens before the transaction ends
+        db.session.rollback()
+    assert len(profile_cache) == 0
+
+
+def test_no_cache_request_rereads_the_row(client, statements):
+    signup(client)
+    client.get('/profile?username=bob')
+    statements.clear()
+    client.get('/profile?username=bob', headers={'Cache-Control': 'no-cache'})
+    assert statements == ['SELECT']
@@ -0,0 +1,72 @@
+import types
+
+import pytest
+
+from backend import resilience
+from backend.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable monotonic clock for the breaker module."""
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(resilience, 'time', types.SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_opens_after_threshold_and_fails_fast(clock):
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker('test', failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.value += 29.9
+    assert not breaker.allow()
+    clock.value += 0.1
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # the probe is still out
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_for_a_full_timeout(clock):
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.value += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.value += 29
+    assert not breaker.allow()
+    clock.value += 1
+    assert breaker.allow()
+    assert breaker.snapshot()['transitions'] == {CLOSED: 0, OPEN: 2, HALF_OPEN: 2}
+
+
+def test_released_probe_frees_the_half_open_slot(clock):
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.value += 30
+    assert breaker.allow()
+    breaker.release()  # e.g. no model slot was free, so nothing was sent
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
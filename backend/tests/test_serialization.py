@@ -0,0 +1,40 @@
+import pytest
+
+from backend.serialization import extract_json_object
+
+ANSWER = {"skin_tone": "#c68642", "season": "Autumn", "recommended_colors": ["#800000", "#ffd700"]}
+BODY = '{"skin_tone": "#c68642", "season": "Autumn", "recommended_colors": ["#800000", "#ffd700"]}'
+
+
+@pytest.mark.parametrize('reply', [
+    BODY,
+    f'  \n{BODY}\n',
+    f'```json\n{BODY}\n```',
+    f'```\n{BODY}\n```',
+    f'Sure! Here is the analysis:\n```json\n{BODY}\n```\nLet me know if you need more.',
+    f'Here is the analysis: {BODY} Hope this helps {{not json}}',
+    f'{BODY}\n\nNotes: the lighting was warm.',
+])
+def test_finds_the_object_in_fenced_and_chatty_replies(reply):
+    assert extract_json_object(reply) == ANSWER
+
+
+def test_braces_in_a_preface_fall_back_to_the_fence():
+    reply = f'Format used: {{skin_tone, season}}\n```json\n{BODY}\n```'
+    assert extract_json_object(reply) == ANSWER
+
+
+def test_nested_objects_are_returned_whole():
+    assert extract_json_object('Result: {"a": {"b": 1}, "c": [2]}') == {"a": {"b": 1}, "c": [2]}
+
+
+@pytest.mark.parametrize('reply', [
+    None,
+    '',
+    'I cannot analyze this image.',
+    '[1, 2, 3]',
+    '{"skin_tone": "#c68642", "season": ',  # cut off mid-object
+    'Result: {"a": {"b": 1}, "c": ',  # broken outer object: no inner fragment either
+])
+def test_no_object_is_none(reply):
+    assert extract_json_object(reply) is None
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from backend.single_flight import SingleFlight, SQLiteLockStore
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _start(target, *args):
+    thread = threading.Thread(target=target, args=args)
+    thread.start()
+    return thread
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight(wait_timeout=5)
+    release = threading.Event()
+    calls = []
+
+    def analyze():
+        calls.append(1)
+        release.wait(5)
+        return {'season': 'Light', 'colours': ['#fff']}
+
+    results = []
+    threads = [_start(lambda: results.append(flight.do('k', analyze)))]
+    _wait_for(lambda: calls)
+    threads += [_start(lambda: results.append(flight.do('k', analyze))) for _ in range(3)]
+    _wait_for(lambda: flight._calls['k'].waiters == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{'season': 'Light', 'colours': ['#fff']}] * 4
+    # Each caller gets its own copy to mutate
+    results[0]['colours'].append('#000')
+    assert results[1]['colours'] == ['#fff']
+    assert flight._calls == {}
+
+
+def test_followers_see_the_leaders_error():
+    flight = SingleFlight(wait_timeout=5)
+    release = threading.Event()
+    started = threading.Event()
+
+    def analyze():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("model down")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do('k', analyze)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [_start(call)]
+    started.wait(5)
+    threads.append(_start(call))
+    _wait_for(lambda: flight._calls['k'].waiters == 1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ["model down"] * 2
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+
+
+def test_stuck_leader_degrades_to_running_alone():
+    flight = SingleFlight(wait_timeout=0.05)
+    release = threading.Event()
+    started = threading.Event()
+    leader = _start(flight.do, 'k', lambda: started.set() or release.wait(5))
+    started.wait(5)
+    assert flight.do('k', lambda: 'own') == 'own'
+    release.set()
+    leader.join()
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / 'single_flight.db')
+
+
+def test_workers_share_a_result_through_the_store(store_path):
+    # Two SingleFlight instances on one file stand in for two gunicorn workers
+    first = SingleFlight(SQLiteLockStore(store_path, poll_interval=0.01), wait_timeout=5)
+    second = SingleFlight(SQLiteLockStore(store_path, poll_interval=0.01), wait_timeout=5)
+    release = threading.Event()
+    started = threading.Event()
+
+    def analyze():
+        started.set()
+        release.wait(5)
+        return {'season': 'Deep'}
+
+    leader = _start(first.do, 'k', analyze)
+    started.wait(5)
+    result = []
+    follower = _start(lambda: result.append(second.do('k', lambda: pytest.fail("ran twice"))))
+    release.set()
+    leader.join()
+    follower.join()
+    assert result == [{'season': 'Deep'}]
+
+
+def test_failed_leader_releases_the_lease(store_path):
+    flight = SingleFlight(SQLiteLockStore(store_path), wait_timeout=5)
+    with pytest.raises(RuntimeError):
+        flight.do('k', lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert flight.do('k', lambda: 'retried') == 'retried'
@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from backend.models import db, User
+from backend.user_repository import UserExists, create_user
+
+
+def signup(client, username='bob', email='bob@example.com'):
+    return client.post('/signup', data={'username': username, 'email': email, 'password': 'secret123'})
+
+
+def test_signup_query_count(client, statements):
+    assert signup(client).status_code == 200
+    # One existence check covering username and email, then the insert
+    assert statements == ['SELECT', 'INSERT']
+
+
+def test_duplicate_signup_is_one_query(client, statements):
+    signup(client)
+    statements.clear()
+    response = signup(client, 'BOB', 'other@example.com')
+    assert response.status_code == 400
+    assert statements == ['SELECT']
+
+
+def test_login_and_profile_query_counts(client, statements):
+    signup(client)
+    statements.clear()
+    assert client.post('/login', data={'username': 'BOB@example.com', 'password': 'x'}).status_code == 200
+    assert statements == ['SELECT']
+
+    statements.clear()
+    assert client.get('/profile?username=bob').status_code == 200
+    assert statements == ['SELECT']
+    statements.clear()
+    assert client.get('/profile?username=Bob').status_code == 200
+    assert statements == []  # served from the profile cache
+
+
+def test_settings_write_query_counts(client, statements):
+    signup(client)
+    statements.clear()
+    client.post('/api/update-settings', data={'username': 'bob', 'dark_mode': 'false'})
+    assert statements == ['SELECT', 'UPDATE']
+
+    statements.clear()
+    client.post('/api/update-settings', data={'username': 'bob', 'dark_mode': 'false'})
+    assert statements == ['SELECT']  # unchanged value: no write
+
+
+def test_usernames_and_emails_are_unique_ignoring_case(app):
+    with app.app_context():
+        db.session.add(User(username='Bob', email='bob@example.com'))
+        db.session.commit()
+        for fields in ({'username': 'bob', 'email': 'x@example.com'}, {'username': 'x', 'email': 'BOB@example.com'}):
+            db.session.add(User(**fields))
+            with pytest.raises(IntegrityError):
+                db.session.commit()
+            db.session.rollback()
+
+
+def test_signup_race_maps_to_user_exists(app, monkeypatch):
+    with app.app_context():
+        create_user('Bob', 'bob@example.com')
+        # Another worker's insert landed after our existence check
+        monkeypatch.setattr(db.session, 'query', lambda *a: _NoRows())
+        with pytest.raises(UserExists):
+            create_user('bob', 'other@example.com')
+
+
+class _NoRows:
+    def filter(self, *args):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def all(self):
+        return []
@@ -0,0 +1,82 @@
+from tempfile import SpooledTemporaryFile
+
+from flask import Request, current_app, jsonify, request
+
+# Leading bytes of the image formats the analyzers can decode
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'BM', 'image/bmp'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+# Content types a client may declare for an image part; anything else is refused
+# before the image is decoded. The body itself has already been parsed (and
+# spooled) by then: only MAX_CONTENT_LENGTH, checked from the Content-Length
+# header in reject_oversized_request(), stops an upload before it is read.
+# The magic bytes still have the final say.
+ACCEPTED_CONTENT_TYPES = {'image/jpeg', 'image/jpg', 'image/png', 'image/webp', 'image/bmp', 'image/gif',
+                          'application/octet-stream', ''}
+
+
+class UploadRejected(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+    def response(self):
+        return jsonify({"error": self.message}), self.status
+
+
+class SpooledUploadRequest(Request):
+    """Request whose file parts spool to disk past UPLOAD_SPOOL_THRESHOLD bytes.
+
+    Werkzeug's default keeps up to 500 KB per part in memory; making the limit
+    configurable lets small deployments keep worker RSS flat regardless of
+    how large the (capped) upload is.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        threshold = current_app.config['UPLOAD_SPOOL_THRESHOLD'] if current_app else 500 * 1024
+        return SpooledTemporaryFile(max_size=threshold, mode='rb+')
+
+
+def sniff_image_type(head):
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def reject_oversized_request():
+    """before_request hook: refuse bodies over MAX_CONTENT_LENGTH from the header alone."""
+    limit = current_app.config.get('MAX_CONTENT_LENGTH')
+    if limit and request.content_length and request.content_length > limit:
+        return jsonify({"error": f"Upload too large (limit {limit // (1024 * 1024)} MB)"}), 413
+    return None
+
+
+def get_image_upload(*field_names):
+    """Returns the first present file part among `field_names`, validated as an image.
+
+    The part's declared content type and its first bytes are checked without
+    decoding the image (the multipart body is already parsed at this point).
+    Raises UploadRejected on failure.
+    """
+    file = next((request.files[name] for name in field_names if name in request.files), None)
+    if file is None:
+        raise UploadRejected("No image provided")
+    if file.filename == '':
+        raise UploadRejected("No selected file")
+    if (file.mimetype or '').lower() not in ACCEPTED_CONTENT_TYPES:
+        raise UploadRejected(f"Unsupported file type: {file.mimetype}", 415)
+
+    stream = file.stream
+    head = stream.read(16)
+    stream.seek(0)
+    if sniff_image_type(head) is None:
+        raise UploadRejected("Unsupported or corrupt image file", 415)
+    return file
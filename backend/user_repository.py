@@ -0,0 +1,120 @@
+from datetime import datetime
+
+from flask import g, has_request_context
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+
+from backend.metrics import USER_UPDATES
+from backend.models import db, User
+from backend.profile_cache import mark_dirty, profile_cache
+
+# Usernames and emails are matched case-insensitively; the lower() expression
+# indexes from migration 5b7e2c91d4a3 back these lookups, and are unique since
+# f2a8c4d6e913, so `Bob` and `bob` can't both sign up even concurrently.
+
+_LATEST = object()
+
+
+class UserExists(Exception):
+    pass
+
+
+def _request_cache():
+    if not has_request_context():
+        return {}
+    if '_user_cache' not in g:
+        g._user_cache = {}
+    return g._user_cache
+
+
+def get_user(username=None):
+    """Resolves the user a request acts on, at most once per request.
+
+    With no username this falls back to the most recently registered user
+    (the demo behaviour the routes have always had).
+    """
+    key = username.lower() if username else _LATEST
+    cache = _request_cache()
+    if key in cache:
+        return cache[key]
+    if username:
+        user = User.query.filter(func.lower(User.username) == key).first()
+    else:
+        user = User.query.order_by(User.id.desc()).first()
+    cache[key] = user
+    if user is not None:
+        cache[user.username.lower()] = user
+    return user
+
+
+def find_by_identifier(identifier):
+    """Single lookup by username or email, as accepted by /login."""
+    identifier = identifier.lower()
+    user = User.query.filter(
+        or_(func.lower(User.username) == identifier, func.lower(User.email) == identifier)
+    ).first()
+    if user is not None:
+        _request_cache()[user.username.lower()] = user
+    return user
+
+
+def create_user(username, email, **fields):
+    """Inserts a new user, raising UserExists if the username or email is taken.
+
+    One existence query covers both fields; the unique constraints still catch
+    a concurrent signup that slips in between the check and the insert.
+    """
+    taken = db.session.query(User.username, User.email).filter(
+        or_(func.lower(User.username) == username.lower(), func.lower(User.email) == email.lower())
+    ).limit(2).all()
+    for existing_username, existing_email in taken:
+        if existing_username.lower() == username.lower():
+            raise UserExists("Username already exists")
+        raise UserExists("Email already exists")
+
+    user = User(username=username, email=email, **fields)
+    db.session.add(user)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise UserExists("Username or email already exists")
+    _request_cache()[username.lower()] = user
+    return user
+
+
+def update_user(user, **fields):
+    """Writes the columns in `fields` whose value differs from `user`, as one UPDATE.
+
+    Returns {column: new value} for what changed; the caller commits only when
+    that is non-empty, so a no-op write never opens a write transaction. Pass
+    every change a request makes in one call to keep it to a single round trip.
+    The row's version is bumped in the same statement, the loaded `user` is
+    updated in place without being marked dirty, and the cached profile is
+    dropped when the transaction commits.
+    """
+    changes = {name: value for name, value in fields.items() if getattr(user, name) != value}
+    if not changes:
+        USER_UPDATES.inc(outcome='noop')
+        return changes
+    changes['updated_at'] = datetime.utcnow()
+    # Incremented in SQL so concurrent writers never hand out the same version
+    stmt = (update(User).where(User.id == user.id).values(version=User.version + 1, **changes)
+            .execution_options(synchronize_session=False))
+    if db.session.get_bind().dialect.update_returning:
+        version = db.session.execute(stmt.returning(User.version)).scalar_one()
+    else:
+        db.session.execute(stmt)
+        version = db.session.execute(select(User.version).where(User.id == user.id)).scalar_one()
+    for name, value in changes.items():
+        set_committed_value(user, name, value)
+    set_committed_value(user, 'version', version)
+    mark_dirty(db.session, user.username)
+    USER_UPDATES.inc(outcome='written')
+    return changes
+
+
+def get_profile(username, refresh=False):
+    """Rendered profile (profile_cache.ProfileEntry) for `username`, from the cache when possible."""
+    return profile_cache.get(username, get_user, refresh=refresh)
@@ -0,0 +1,21 @@
+"""Gunicorn settings, read automatically from the directory gunicorn starts in (see Procfile).
+
+Workers come from WEB_CONCURRENCY and threads per worker from WEB_THREADS;
+the DB pool is sized from the same two variables (backend/db_pool.py), so set
+them rather than --workers/--threads.
+
+With GUNICORN_PRELOAD=true the app is imported once in the master (which
+also imports the analysis stack, see backend/startup.py) and each forked
+worker resets its DB pool and model client in post_fork.
+"""
+import os
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('WEB_THREADS', 1))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from backend.startup import after_fork
+        after_fork(worker.app.wsgi())
@@ -0,0 +1,28 @@
+"""Add case-insensitive user lookup indexes
+
+Revision ID: 5b7e2c91d4a3
+Revises: 0e0ba916eedb
+Create Date: 2026-10-18 10:12:40.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c91d4a3'
+down_revision = '0e0ba916eedb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_username_lower', [sa.text('lower(username)')], unique=False)
+        batch_op.create_index('ix_user_email_lower', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_email_lower')
+        batch_op.drop_index('ix_user_username_lower')
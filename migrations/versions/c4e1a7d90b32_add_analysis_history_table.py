@@ -0,0 +1,42 @@
+"""Add analysis history table
+
+Revision ID: c4e1a7d90b32
+Revises: 5b7e2c91d4a3
+Create Date: 2026-10-18 14:02:11.604918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e1a7d90b32'
+down_revision = '5b7e2c91d4a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analysis',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('analysis_type', sa.String(length=32), nullable=False),
+    sa.Column('image_hash', sa.String(length=64), nullable=False),
+    sa.Column('engine', sa.String(length=32), nullable=True),
+    sa.Column('latency_ms', sa.Integer(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('analysis', schema=None) as batch_op:
+        batch_op.create_index('ix_analysis_user_type_created', ['user_id', 'analysis_type', 'created_at'], unique=False)
+        batch_op.create_index('ix_analysis_hash_type_created', ['image_hash', 'analysis_type', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('analysis', schema=None) as batch_op:
+        batch_op.drop_index('ix_analysis_hash_type_created')
+        batch_op.drop_index('ix_analysis_user_type_created')
+
+    op.drop_table('analysis')
@@ -0,0 +1,33 @@
+"""Make lower(username) and lower(email) indexes unique
+
+Revision ID: f2a8c4d6e913
+Revises: e9d3f6a27c51
+Create Date: 2026-10-18 18:05:12.402177
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8c4d6e913'
+down_revision = 'e9d3f6a27c51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fails if existing rows already differ only by case; merge those accounts first
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_email_lower')
+        batch_op.drop_index('ix_user_username_lower')
+        batch_op.create_index('ix_user_username_lower', [sa.text('lower(username)')], unique=True)
+        batch_op.create_index('ix_user_email_lower', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_email_lower')
+        batch_op.drop_index('ix_user_username_lower')
+        batch_op.create_index('ix_user_username_lower', [sa.text('lower(username)')], unique=False)
+        batch_op.create_index('ix_user_email_lower', [sa.text('lower(email)')], unique=False)